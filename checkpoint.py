@@ -0,0 +1,131 @@
+"""Checkpoint of an interrupted ``run_pipeline``: search cursors and in-flight records.
+
+The file lives next to the inventory (``DATA_DIR/checkpoint.json``). It keeps, per
+source and keyword, the pagination progress handed to the ``iter_*`` search functions
+and the records that were found but not yet written to the inventory.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+import config
+import logwriter
+from search.record import Record
+
+_VERSION = 1
+
+
+class Checkpoint:
+    def __init__(self, path: Path, filters: str = ""):
+        self.path = Path(path)
+        self.filters = filters  # SearchFilters.signature() the cursors belong to
+        self.search: dict[str, dict[str, dict]] = {}
+        self.inflight: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one writer of the file at a time
+        self._saved = time.monotonic()
+
+    @classmethod
+    def load(cls, path: Path | None = None, filters: str = "") -> "Checkpoint":
+        """Read the checkpoint of the output directory (an empty one if there is none).
+
+        Search cursors saved for other search filters are dropped.
+        """
+        cp = cls(path or Path(config.DATA_DIR) / "checkpoint.json", filters)
+        try:
+            data = json.loads(cp.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return cp
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {cp.path}: {e}", flush=True)
+            return cp
+        if data.get("version") == _VERSION:
+            cp.inflight = data.get("inflight") or {}
+            if data.get("filters", "") == filters:
+                cp.search = data.get("search") or {}
+            else:
+                print("Search filters changed since the checkpoint: searching from the start", flush=True)
+        return cp
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.search or self.inflight)
+
+    def progress(self, source: str, kw: str) -> dict:
+        """Pagination progress of ``kw`` in ``source``, created if missing.
+
+        The dict is mutated in place by the search function that receives it.
+        """
+        with self._lock:
+            per_source = self.search.setdefault(source, {})
+            return per_source.setdefault(kw, {"cursor": None, "collected": 0, "done": False})
+
+    def pending_records(self) -> list[tuple[tuple[str, ...], str, Record]]:
+        """In-flight records of the previous run as ``(keywords, rec_id, rec)`` items."""
+        with self._lock:
+            return [
+                (tuple(e["keywords"]), e["rec_id"], Record.from_dict(e["rec"]))
+                for e in self.inflight.values()
+            ]
+
+    def add_inflight(self, nd: str, kws: tuple[str, ...], rec_id: str, rec: Record) -> None:
+        entry = {"keywords": list(kws), "rec_id": rec_id, "rec": rec.to_dict()}
+        with self._lock:
+            self.inflight.setdefault(nd, entry)
+
+    def remove_inflight(self, nd: str) -> None:
+        with self._lock:
+            self.inflight.pop(nd, None)
+
+    def save(self) -> None:
+        """Write the checkpoint atomically.
+
+        Records leave ``inflight`` only after their inventory row was queued, so the
+        queued rows are committed after the snapshot is taken and before it is written.
+        """
+        with self._write_lock:
+            with self._lock:
+                data = json.dumps(
+                    {
+                        "version": _VERSION,
+                        "filters": self.filters,
+                        "search": self.search,
+                        "inflight": self.inflight,
+                    },
+                    ensure_ascii=False,
+                    default=str,
+                )
+                self._saved = time.monotonic()
+            logwriter.flush()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def maybe_save(self) -> None:
+        """Save when ``config.CHECKPOINT_INTERVAL`` seconds passed since the last save."""
+        if time.monotonic() - self._saved < config.CHECKPOINT_INTERVAL:
+            return
+        with self._lock:
+            if time.monotonic() - self._saved < config.CHECKPOINT_INTERVAL:
+                return
+            self._saved = time.monotonic()  # claim this save for the current thread
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Failed to write checkpoint {self.path}: {e}", flush=True)
+
+    def discard(self) -> None:
+        """Remove the checkpoint after a run that completed."""
+        for path in (self.path, self.path.with_name(self.path.name + ".tmp")):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,11 +1,13 @@
 import sys
 import argparse
+import config
+from inventory import export_inventory_csv
 from pipeline import run_pipeline
 
 
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Universal articles parser")
-    parser.add_argument("--keywords", nargs="+", required=True, help="search keywords")
+    parser.add_argument("--keywords", nargs="+", help="search keywords")
     parser.add_argument("--abstract-filter", action="store_true", help="enable abstract filtering")
     parser.add_argument("--abstract-regex", nargs="*", default=[], help="regular expressions that must appear in abstract")
     parser.add_argument("--fulltext-filter", action="store_true", help="enable full text regex filtering")
@@ -17,7 +19,35 @@ def main(argv=None):
     )
     parser.add_argument("--oa-only", action="store_true", help="only download open access articles")
     parser.add_argument("--max-per-source", type=int, default=None, help="limit of records per source")
+    parser.add_argument(
+        "--require-abstract",
+        action="store_true",
+        help="only search records with an abstract (filtered by the APIs)",
+    )
+    parser.add_argument("--from-date", default=None, help="earliest publication date (YYYY, YYYY-MM or YYYY-MM-DD)")
+    parser.add_argument("--to-date", default=None, help="latest publication date (YYYY, YYYY-MM or YYYY-MM-DD)")
     parser.add_argument("--output-dir", default="data", help="directory for output data")
+    parser.add_argument("--download-workers", type=int, default=None, help="number of concurrent downloads")
+    parser.add_argument(
+        "--combine-keywords",
+        action="store_true",
+        help="send one OR query for all keywords to sources that support it (OpenAlex, EuropePMC, arXiv)",
+    )
+    parser.add_argument(
+        "--probe-abstracts",
+        action="store_true",
+        help="apply the abstract filter to the first PDF pages (or XML abstract) of records without an abstract",
+    )
+    parser.add_argument(
+        "--prefer-xml",
+        action="store_true",
+        help="do not download the PDF of records whose XML full text was downloaded",
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="page large OpenAlex, Crossref and EuropePMC result sets as parallel publication-year ranges",
+    )
     parser.add_argument(
         "--sources",
         nargs="*",
@@ -50,8 +80,26 @@ def main(argv=None):
         action="store_false",
         help="do not store extracted text files for downloaded articles",
     )
+    parser.add_argument(
+        "--export-inventory",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="CSV_PATH",
+        help="export the inventory database of --output-dir to CSV (default <output-dir>/inventory.csv) and exit",
+    )
     args = parser.parse_args(argv)
 
+    if args.export_inventory is not None:
+        config.set_output_dir(args.output_dir)
+        if not config.LOG_INVENTORY_DB.exists():
+            parser.error(f"inventory database not found: {config.LOG_INVENTORY_DB}")
+        target = export_inventory_csv(args.export_inventory or None)
+        print(f"Inventory exported to {target}", flush=True)
+        return
+    if not args.keywords:
+        parser.error("the following arguments are required: --keywords")
+
     run_pipeline(
         keywords=args.keywords,
         abstract_filter=args.abstract_filter,
@@ -64,6 +112,14 @@ def main(argv=None):
         sources=args.sources or None,
         verbose=args.verbose,
         save_text=args.save_text,
+        download_workers=args.download_workers,
+        combine_keywords=args.combine_keywords,
+        require_abstract=args.require_abstract,
+        from_date=args.from_date,
+        to_date=args.to_date,
+        sharded=args.sharded,
+        prefer_xml=args.prefer_xml,
+        probe_abstracts=args.probe_abstracts,
     )
 
 
@@ -10,7 +10,110 @@ def set_keywords(keywords: list[str]) -> None:
 
 # HTTP / API
 REQUESTS_TIMEOUT = 30
-RATE_LIMIT_SLEEP = 0.5
+RATE_LIMIT_SLEEP = 0.5  # minimal interval between requests to hosts without an entry in RATE_LIMITS
+RATE_LIMIT_BACKOFF = 10.0  # pause (s) after a 429/503 that carries no Retry-After header
+
+# Retries of timeouts, connection errors, 429 and 5xx responses (see resilience.py), with
+# full-jitter exponential backoff; 4xx responses are not retried
+HTTP_RETRIES = 3
+HTTP_BACKOFF_BASE = 1.0  # s
+HTTP_BACKOFF_MAX = 30.0  # s
+# Circuit breaker per host: after CIRCUIT_FAILURES failures in a row, requests to the host
+# fail at once for CIRCUIT_RESET seconds
+CIRCUIT_FAILURES = 5
+CIRCUIT_RESET = 60.0
+
+# Token buckets per host (or host + path prefix): key -> (requests per second, burst)
+RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "api.openalex.org": (10.0, 10),  # polite pool
+    "api.crossref.org": (10.0, 5),  # polite pool (mailto); lowered by X-Rate-Limit-* headers
+    "www.ebi.ac.uk": (10.0, 5),  # EuropePMC REST
+    "export.arxiv.org": (1 / 3, 1),  # arXiv API terms: one request every 3 s
+    "api.elsevier.com/content/search": (2.0, 2),  # ScienceDirect Search quota
+    "api.elsevier.com/content/article": (10.0, 5),  # Article Retrieval quota
+}
+
+# Shared HTTP client (see http_client.py)
+HTTP_POOL_CONNECTIONS = 32  # number of per-host connection pools kept alive
+HTTP_POOL_MAXSIZE = 16  # keep-alive connections per host
+HTTP2_ENABLED = False  # requires the optional ``httpx[http2]`` dependency
+
+# Cache of search API responses (see http_cache.py): URL prefix -> time to live in seconds.
+# Expired entries are revalidated with ETag/Last-Modified when the server sent them.
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_MAX_BYTES = 1024**3
+HTTP_CACHE_TTLS: dict[str, float] = {
+    "api.openalex.org/works": 7 * 86400,
+    "api.crossref.org/works": 7 * 86400,
+    "www.ebi.ac.uk/europepmc/webservices/rest/search": 7 * 86400,
+    "export.arxiv.org/api/query": 7 * 86400,
+    "api.elsevier.com/content/search": 86400,
+    "www.ebi.ac.uk/europepmc/webservices/rest/PMC": 30 * 86400,  # fullTextXML
+}
+# Missing abstracts looked up by DOI before the abstract filter (see search/abstracts.py):
+# records are batched up to ENRICH_BATCH_SIZE or ENRICH_BATCH_WAIT seconds
+ENRICH_BATCH_SIZE = 50
+ENRICH_BATCH_WAIT = 2.0
+BULK_DOIS = 50  # DOIs per bulk abstract request (OpenAlex allows 50 values in one OR filter)
+ABSTRACT_CACHE_TTL = 30 * 86400
+ABSTRACT_CACHE_MISS_TTL = 86400  # DOIs no provider had an abstract for
+# Parallel fetches of EuropePMC JATS full texts (see search/europepmc.py)
+EUROPEPMC_FULLTEXT_WORKERS = 4
+EUROPEPMC_FULLTEXT_PENDING = 16  # prefetched full texts held for the download stage at most
+
+# Keep each search result's API item (compressed) in Record.raw; dropped by default to save memory
+KEEP_RAW_RECORDS = False
+
+# Sharded search (run_pipeline(sharded=True)): queries with more hits are split into
+# publication-year ranges of about SHARD_TARGET hits, paged by SHARD_WORKERS threads per source
+SHARD_TARGET = 10_000
+SHARD_WORKERS = 4
+
+# Offset-paged sources (arXiv, ScienceDirect): pages requested ahead of the one being parsed
+SEARCH_PAGE_PREFETCH = 3
+
+# Streaming pipeline: capacity of the queues between search, download and filter stages
+PIPELINE_QUEUE_SIZE = 64
+
+# Concurrent downloads: worker threads and simultaneous transfers per host
+DOWNLOAD_WORKERS = 8
+HOST_CONCURRENCY_DEFAULT = 4
+HOST_CONCURRENCY: dict[str, int] = {
+    "api.elsevier.com": 2,
+    "arxiv.org": 6,
+    "export.arxiv.org": 6,
+    "europepmc.org": 6,
+    "www.ebi.ac.uk": 6,
+}
+
+# Downloads are written to ``<name>.<url hash>.part`` and renamed when complete; interrupted
+# transfers resume with HTTP Range requests (also on the next run)
+DOWNLOAD_MAX_BYTES = 200 * 1024**2
+DOWNLOAD_MIN_RATE = 10 * 1024  # bytes/s over DOWNLOAD_RATE_WINDOW seconds, slower transfers are dropped
+DOWNLOAD_RATE_WINDOW = 30
+DOWNLOAD_RESUME_ATTEMPTS = 2  # immediate resumes after a dropped connection
+
+# PDF extraction processes (0 runs pdfminer/camelot in the calling process)
+EXTRACT_WORKERS = os.cpu_count() or 1
+# Without save_text, stop reading a PDF at the first page matching a fulltext pattern
+FULLTEXT_EARLY_EXIT = True
+
+# Abstract probe (run_pipeline(probe_abstracts=True)): pages read to find the abstract of a
+# downloaded PDF whose record came without one
+ABSTRACT_PROBE_PAGES = 2
+
+# Extraction cache shared by all output directories (see extract_cache.py)
+CACHE_DIR = Path.home() / ".cache" / "articles_parser"
+EXTRACT_CACHE_ENABLED = True
+EXTRACT_CACHE_MAX_BYTES = 2 * 1024**3
+
+# Write-behind logging of inventory rows and DOI lists (see logwriter.py)
+LOG_DURABILITY = "batch"  # "always" (fsync every write), "batch" (fsync per group commit) or "none"
+LOG_FLUSH_ROWS = 100
+LOG_FLUSH_INTERVAL_MS = 500
+
+# Resumable runs: seconds between writes of DATA_DIR/checkpoint.json (see checkpoint.py)
+CHECKPOINT_INTERVAL = 30
 
 # Paths (can be overridden by the user)
 DATA_DIR = Path("data")
@@ -18,7 +121,8 @@ PDF_DIR = DATA_DIR / "pdfs"
 XML_DIR = DATA_DIR / "xmls"
 TEXT_DIR = DATA_DIR / "texts"
 
-LOG_INVENTORY = DATA_DIR / "inventory.csv"
+LOG_INVENTORY = DATA_DIR / "inventory.csv"  # CSV export of LOG_INVENTORY_DB
+LOG_INVENTORY_DB = DATA_DIR / "inventory.sqlite"
 LOG_PDF_DOI = DATA_DIR / "pdf_doi.txt"
 LOG_XML_DOI = DATA_DIR / "xml_doi.txt"
 LOG_DOI_NOT_DOWNL = DATA_DIR / "doi_not_downl.txt"
@@ -26,12 +130,13 @@ LOG_DOI_NOT_DOWNL = DATA_DIR / "doi_not_downl.txt"
 def set_output_dir(path: str | Path) -> None:
     """Adjust all output paths to a new base directory."""
     global DATA_DIR, PDF_DIR, XML_DIR, TEXT_DIR
-    global LOG_INVENTORY, LOG_PDF_DOI, LOG_XML_DOI, LOG_DOI_NOT_DOWNL
+    global LOG_INVENTORY, LOG_INVENTORY_DB, LOG_PDF_DOI, LOG_XML_DOI, LOG_DOI_NOT_DOWNL
     DATA_DIR = Path(path)
     PDF_DIR = DATA_DIR / "pdfs"
     XML_DIR = DATA_DIR / "xmls"
     TEXT_DIR = DATA_DIR / "texts"
     LOG_INVENTORY = DATA_DIR / "inventory.csv"
+    LOG_INVENTORY_DB = DATA_DIR / "inventory.sqlite"
     LOG_PDF_DOI = DATA_DIR / "pdf_doi.txt"
     LOG_XML_DOI = DATA_DIR / "xml_doi.txt"
     LOG_DOI_NOT_DOWNL = DATA_DIR / "doi_not_downl.txt"
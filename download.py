@@ -1,12 +1,20 @@
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
 from urllib.parse import urlparse, urljoin, parse_qs
 from bs4 import BeautifulSoup
+import glob
+import hashlib
+import os
 import requests
+import threading
 import time
 
 import config
+import http_client
+import logwriter
 from scidownl import scihub_download
+from search.europepmc import fetch_fulltext_xml, fulltext_pmcid, prefetch_fulltext_xml
 from utils import is_valid_pdf, delete_if_exists, doi_to_fname, norm_doi
 
 _LIBGEN_MIN_DELAY_SECONDS = 4
@@ -15,6 +23,12 @@ _LIBGEN_MAX_ATTEMPTS = 5
 _LIBGEN_RATE_LIMIT_MAX_DELAY = 60.0
 
 _libgen_last_attempt_completed_at: float | None = None
+_libgen_lock = threading.Lock()  # LibGen attempts are spaced out, so run them one at a time
+
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+_HEAD_BYTES = 1024  # bytes inspected before a download is accepted as PDF/XML
 
 
 def _wait_for_libgen_window(delay: float) -> None:
@@ -73,16 +87,29 @@ def _elsevier_headers(accept: str) -> dict[str, str]:
         headers["X-ELS-APIKey"] = api_key
     return headers
 
+@contextmanager
+def _host_slot(url: str):
+    """Limit simultaneous transfers per host to ``config.HOST_CONCURRENCY``."""
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except Exception:
+        host = ""
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            limit = config.HOST_CONCURRENCY.get(host, config.HOST_CONCURRENCY_DEFAULT)
+            slot = threading.BoundedSemaphore(max(1, limit))
+            _host_slots[host] = slot
+    with slot:
+        yield
+
 def append_line(path: Path, doi: str):
-    with path.open("a", encoding="utf-8") as f:
-        f.write((norm_doi(doi) or "") + "\n")
+    logwriter.write_line(path, norm_doi(doi) or "")
 
 def _request_with_error(url: str, *, stream: bool, headers: dict[str, str] | None = None):
-    time.sleep(config.RATE_LIMIT_SLEEP)
     try:
-        response = requests.get(
+        response = http_client.get(
             url,
-            timeout=config.REQUESTS_TIMEOUT,
             stream=stream,
             allow_redirects=True,
             headers=headers,
@@ -106,23 +133,150 @@ def _request_with_error(url: str, *, stream: bool, headers: dict[str, str] | Non
         return None, str(e)
 
 
-def download_file(
-    url: str, target_path: Path, headers: dict[str, str] | None = None
-) -> tuple[bool, str | None]:
-    response, error = _request_with_error(url, stream=True, headers=headers)
+def _part_path(target_path: Path, url: str) -> Path:
+    """Temporary file of a download; one per URL, so a resume never mixes two sources."""
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return target_path.with_name(f"{target_path.name}.{digest}.part")
+
+
+def _looks_like_html(head: bytes) -> bool:
+    head = head[:_HEAD_BYTES].lower()
+    return b"<html" in head or b"<!doctype html" in head
+
+
+def _content_problem(target_path: Path, head: bytes, content_type: str | None) -> str | None:
+    """Why the start of a download is not the PDF/XML ``target_path`` expects (``None`` if it is)."""
+    kind = target_path.suffix.lower()
+    if kind not in (".pdf", ".xml"):
+        return None
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "text/html" or _looks_like_html(head):
+        return f"HTML page instead of {kind[1:].upper()} (landing or paywall page)"
+    if kind == ".pdf" and head and not head.startswith(b"%PDF-"):
+        return "not a PDF (missing %PDF- signature)"
+    if kind == ".xml" and head and not head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        return "not an XML document"
+    return None
+
+
+def is_complete_file(path: Path) -> bool:
+    """Whether ``path`` holds a PDF/XML that passes the checks applied to downloads."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEAD_BYTES)
+    except OSError:
+        return False
+    return bool(head) and _content_problem(path, head, None) is None
+
+
+def _transfer(
+    url: str, target_path: Path, part: Path, headers: dict[str, str] | None
+) -> tuple[bool, str | None, bool]:
+    """One attempt of ``download_file``: ``(ok, error, resumable)``."""
+    try:
+        offset = part.stat().st_size
+    except OSError:
+        offset = 0
+    request_headers = dict(headers or {})
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+    response, error = _request_with_error(url, stream=True, headers=request_headers)
     if not response:
-        return False, error
+        if offset and (error or "").startswith("HTTP 416"):
+            delete_if_exists(part)  # the partial file does not fit the resource (any more)
+            return _transfer(url, target_path, part, headers)
+        return False, error, not (error or "").startswith("HTTP ")  # keep the part after network errors
     try:
-        with open(target_path, "wb") as f:
+        if offset and response.status_code != 206:
+            offset = 0  # Range not supported: start over
+        content_type = response.headers.get("Content-Type")
+        if not offset:
+            problem = _content_problem(target_path, b"", content_type)
+            if problem:
+                return False, problem, False
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and offset + int(length) > config.DOWNLOAD_MAX_BYTES:
+            return False, f"larger than {config.DOWNLOAD_MAX_BYTES} bytes", False
+
+        head = b"" if not offset else None
+        size = offset
+        window_start, window_bytes = time.monotonic(), 0
+        with open(part, "ab" if offset else "wb") as f:
             for chunk in response.iter_content(chunk_size=65536):
-                if chunk:
-                    f.write(chunk)
-        return True, None
+                if not chunk:
+                    continue
+                f.write(chunk)
+                size += len(chunk)
+                window_bytes += len(chunk)
+                if head is not None:
+                    head += chunk
+                    if len(head) >= _HEAD_BYTES:
+                        problem = _content_problem(target_path, head, None)
+                        if problem:
+                            return False, problem, False
+                        head = None
+                if size > config.DOWNLOAD_MAX_BYTES:
+                    return False, f"larger than {config.DOWNLOAD_MAX_BYTES} bytes", False
+                elapsed = time.monotonic() - window_start
+                if elapsed >= config.DOWNLOAD_RATE_WINDOW:
+                    if window_bytes / elapsed < config.DOWNLOAD_MIN_RATE:
+                        return False, f"stalled transfer ({window_bytes / elapsed / 1024:.1f} KB/s)", True
+                    window_start, window_bytes = time.monotonic(), 0
+        if not size:
+            return False, "empty response", False
+        with open(part, "rb") as f:
+            problem = _content_problem(target_path, f.read(_HEAD_BYTES), None)
+        if problem:
+            return False, problem, False
+        os.replace(part, target_path)
+        return True, None, False
     except Exception as e:
-        return False, str(e)
+        return False, str(e), True
     finally:
         response.close()
 
+
+def _save_fulltext_xml(pmcid: str, xml_path: Path) -> tuple[bool, str | None]:
+    """Write the EuropePMC JATS full text of ``pmcid`` (prefetched or fetched now) to ``xml_path`` atomically."""
+    data = fetch_fulltext_xml(pmcid)
+    if not data:
+        return False, f"no EuropePMC full text for {pmcid}"
+    problem = _content_problem(xml_path, data[:_HEAD_BYTES], None)
+    if problem:
+        return False, problem
+    part = xml_path.with_name(xml_path.name + ".part")
+    try:
+        part.write_bytes(data)
+        os.replace(part, xml_path)
+        return True, None
+    except OSError as e:
+        delete_if_exists(part)
+        return False, str(e)
+
+
+def download_file(
+    url: str, target_path: Path, headers: dict[str, str] | None = None
+) -> tuple[bool, str | None]:
+    """Download ``url`` to ``target_path``, which appears only once the transfer is complete.
+
+    Data goes to a ``.part`` file first; a dropped transfer keeps it and resumes with a
+    Range request, right away or on a later run. PDF/XML targets are abandoned as soon
+    as the Content-Type or the first bytes show an HTML page, and transfers above
+    ``config.DOWNLOAD_MAX_BYTES`` or slower than ``config.DOWNLOAD_MIN_RATE`` are dropped.
+    """
+    part = _part_path(target_path, url)
+    with _host_slot(url):
+        for attempt in range(config.DOWNLOAD_RESUME_ATTEMPTS + 1):
+            ok, error, resumable = _transfer(url, target_path, part, headers)
+            if ok or not resumable or not part.exists() or attempt == config.DOWNLOAD_RESUME_ATTEMPTS:
+                break
+        if ok:
+            for stale in target_path.parent.glob(f"{glob.escape(target_path.name)}.*.part"):
+                delete_if_exists(stale)
+        elif not resumable:
+            delete_if_exists(part)
+        return ok, error
+
 def find_md5(data: dict):
     if isinstance(data, dict):
         for k, v in data.items():
@@ -140,6 +294,12 @@ def find_md5(data: dict):
 
 def download_via_libgen_stub(
     doi: str, pdf_path: Path, libgen_domain: str
+) -> tuple[bool, str | None]:
+    with _libgen_lock:
+        return _download_via_libgen(doi, pdf_path, libgen_domain)
+
+def _download_via_libgen(
+    doi: str, pdf_path: Path, libgen_domain: str
 ) -> tuple[bool, str | None]:
     global _libgen_last_attempt_completed_at
 
@@ -244,10 +404,21 @@ def try_download_pdf_with_validation(
     oa_only: bool = False,
     libgen_domain: str = "bz",
 ) -> PDFDownloadResult:
-    """Cascade: try primary_url, then LibGen (if allowed). Validate PDF signature after each attempt."""
+    """Cascade: try primary_url, then LibGen (if allowed). Validate PDF signature after each attempt.
+
+    A valid PDF already on disk for ``doi`` is reused.
+    """
     result = PDFDownloadResult()
     pdf_path = config.PDF_DIR / f"{doi_to_fname(doi)}.pdf"
 
+    if is_complete_file(pdf_path):
+        append_line(config.LOG_PDF_DOI, doi)
+        result.success = True
+        result.direct.message = "PDF already on disk"
+        result.scihub.message = "sci-hub download not attempted (PDF already on disk)"
+        result.libgen.message = "libgen download not attempted (PDF already on disk)"
+        return result
+
     if primary_url:
         result.direct.attempted = True
         headers = (
@@ -323,12 +494,26 @@ def try_download_pdf_with_validation(
         result.libgen.message = "libgen download failed"
     return result
 
+def prefetch_xml(doi: str, xml_url: str | None) -> None:
+    """Start fetching the EuropePMC full text ``try_download_xml`` will need, if any."""
+    pmcid = fulltext_pmcid(xml_url)
+    if pmcid and not is_complete_file(config.XML_DIR / f"{doi_to_fname(doi)}.xml"):
+        prefetch_fulltext_xml(pmcid)
+
+
 def try_download_xml(doi: str, xml_url: str | None) -> bool:
     if not xml_url:
         return False
     xml_path = config.XML_DIR / f"{doi_to_fname(doi)}.xml"
-    headers = _elsevier_headers("application/xml") if _is_elsevier_content_url(xml_url) else None
-    ok, _ = download_file(xml_url, xml_path, headers=headers)
+    if is_complete_file(xml_path):
+        append_line(config.LOG_XML_DOI, doi)
+        return True
+    pmcid = fulltext_pmcid(xml_url)
+    if pmcid:
+        ok, _ = _save_fulltext_xml(pmcid, xml_path)
+    else:
+        headers = _elsevier_headers("application/xml") if _is_elsevier_content_url(xml_url) else None
+        ok, _ = download_file(xml_url, xml_path, headers=headers)
     if ok:
         append_line(config.LOG_XML_DOI, doi)
     else:
@@ -1,6 +1,20 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pathlib import Path
-from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text as pdf_extract_text
+import logging
+import signal
+import threading
+from lxml import etree
+import pdfminer
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.high_level import extract_pages
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.layout import LTChar, LTContainer, LTLine, LTRect, LTText, LTTextBox
+import config
+import extract_cache
+from patterns import DOSE_UNITS_RE, G_UNITS_RE, TABLE_CAPTION_RE
 from utils import normalize_spaces
 
 # optional dependencies for tables
@@ -17,41 +31,352 @@ try:
 except Exception:
     pass
 
+# Cache keys include these, so bump the trailing number when an extractor's output changes.
+EXTRACTOR_VERSIONS = {
+    "pdf_text": f"pdfminer-{getattr(pdfminer, '__version__', '')}.2",
+    "pdf_tables": (
+        f"camelot-{getattr(camelot, '__version__', '') if HAS_CAMELOT else 'none'}"
+        f"+tabula-{getattr(tabula, '__version__', '') if HAS_TABULA else 'none'}.2"
+    ),
+    "xml_text": "lxml-iterparse.1",
+    "pdf_head": f"pdfminer-{getattr(pdfminer, '__version__', '')}.1",
+}
+
 def extract_text_from_pdf(pdf_path: Path) -> str:
+    return extract_cache.cached(pdf_path, "pdf_text", EXTRACTOR_VERSIONS["pdf_text"], _extract_text_from_pdf)
+
+def extract_text_from_xml(xml_path: Path) -> str:
+    return extract_cache.cached(xml_path, "xml_text", EXTRACTOR_VERSIONS["xml_text"], _extract_text_from_xml)
+
+def extract_xml_fulltext(xml_path: Path) -> tuple[str, bool]:
+    """``extract_text_from_xml`` and whether that text has the article body.
+
+    Abstract-only responses (Elsevier without entitlement: coredata and abstract)
+    yield text without a body, which cannot stand in for the full text.
+    """
+    version = EXTRACTOR_VERSIONS["xml_text"]
+    text = extract_cache.lookup(xml_path, "xml_text", version)
+    body = extract_cache.lookup(xml_path, "xml_body", version)
+    if text is not None and body is not None:
+        return text, body == "1"
+    text, has_body = _scan_xml(xml_path)
+    if config.EXTRACT_CACHE_ENABLED:
+        try:
+            extract_cache.put(extract_cache.make_key(xml_path, "xml_text", version), text)
+            extract_cache.put(extract_cache.make_key(xml_path, "xml_body", version), "1" if has_body else "")
+        except OSError:
+            pass
+    return text, has_body
+
+def extract_first_pages(pdf_path: Path, pages: int | None = None) -> str:
+    """Text of the first ``pages`` pages (default ``config.ABSTRACT_PROBE_PAGES``), cached."""
+    pages = pages or config.ABSTRACT_PROBE_PAGES
+    version = f"{EXTRACTOR_VERSIONS['pdf_head']}-{pages}p"
+    return extract_cache.cached(pdf_path, "pdf_head", version, partial(_extract_first_pages, pages=pages))
+
+def extract_tables_text(pdf_path: Path) -> str:
+    return extract_cache.cached(pdf_path, "pdf_tables", EXTRACTOR_VERSIONS["pdf_tables"], _extract_tables_text)
+
+# characters of the previous page kept in front of the next one, so matches spanning
+# a page break are still found by the page-wise scan
+PAGE_OVERLAP = 500
+
+def _render_layout(item, out: list[str]) -> None:
+    # same traversal as pdfminer's TextConverter, i.e. what extract_text() returns
+    if isinstance(item, LTContainer):
+        for child in item:
+            _render_layout(child, out)
+    elif isinstance(item, LTText):
+        out.append(item.get_text())
+    if isinstance(item, LTTextBox):
+        out.append("\n")
+
+def iter_pdf_pages(pdf_path: Path):
+    """Yield the raw text of each page (pdfminer layout analysis runs page by page)."""
+    for page in extract_pages(str(pdf_path)):
+        out: list[str] = []
+        _render_layout(page, out)
+        yield "".join(out) + "\f"
+
+def _extract_first_pages(pdf_path: Path, pages: int) -> str:
     try:
-        raw = pdf_extract_text(str(pdf_path))
-        return normalize_spaces(raw)
+        out: list[str] = []
+        for page in extract_pages(str(pdf_path), maxpages=pages):
+            _render_layout(page, out)
+            out.append("\f")
+        return normalize_spaces("".join(out))
     except Exception:
         return ""
 
-def extract_text_from_xml(xml_path: Path) -> str:
+def _extract_text_from_pdf(pdf_path: Path) -> str:
     try:
-        content = xml_path.read_text(encoding="utf-8", errors="ignore")
-        soup = BeautifulSoup(content, "lxml-xml")
-        pieces = []
-        for tag in ["article-title", "title", "abstract", "body"]:
-            for el in soup.find_all(tag):
-                pieces.append(el.get_text(separator=" ", strip=True))
-        if not pieces:
-            pieces.append(soup.get_text(separator=" ", strip=True))
-        raw = "\n\n".join([p for p in pieces if p])
+        raw = "".join(iter_pdf_pages(pdf_path))
         return normalize_spaces(raw)
     except Exception:
         return ""
 
-def extract_tables_text(pdf_path: Path) -> str:
+def scan_pdf(pdf_path: Path, patterns: list) -> tuple[bool, str | None]:
+    """Search ``patterns`` page by page and stop at the first match.
+
+    Returns ``(matched, text)``. ``text`` is the full normalized text when every page
+    was read (no match), otherwise ``None``.
+    """
+    version = EXTRACTOR_VERSIONS["pdf_text"]
+    text = extract_cache.lookup(pdf_path, "pdf_text", version)
+    if text is not None:
+        return any(p.search(text) for p in patterns), text
+
+    pages: list[str] = []
+    tail = ""
+    try:
+        for page in iter_pdf_pages(pdf_path):
+            pages.append(page)
+            window = normalize_spaces(tail + page)
+            if any(p.search(window) for p in patterns):
+                return True, None
+            tail = window[-PAGE_OVERLAP:]
+    except Exception:
+        return False, normalize_spaces("".join(pages))
+
+    text = normalize_spaces("".join(pages))
+    if config.EXTRACT_CACHE_ENABLED:
+        try:
+            extract_cache.put(extract_cache.make_key(pdf_path, "pdf_text", version), text)
+        except OSError:
+            pass
+    return False, text
+
+# XML full text (JATS and Elsevier ce:/xocs:), matched on local names.
+# Zones whose text is kept: 0 = article, 1 = Elsevier coredata (used when there is
+# no article text), 2 = xocs:rawtext (last resort).
+_XML_ZONES = {
+    "article-title": 0,
+    "abstract": 0,
+    "trans-abstract": 0,
+    "body": 0,
+    "floats-group": 0,  # JATS tables/figures kept outside the body
+    "floats": 0,  # ce:floats
+    "coredata": 1,
+    "rawtext": 2,
+}
+# text blocks, emitted as separate paragraphs
+_XML_BLOCKS = {
+    "p", "para", "simple-para", "title", "article-title", "section-title", "subtitle",
+    "label", "caption", "list-item", "def-item", "disp-quote", "description", "textbox",
+}
+_XML_CELLS = {"td", "th", "entry"}  # JATS/HTML and CALS (ce:table) cells
+_XML_ROWS = {"tr", "row"}
+_XML_SKIP = {"ref-list", "bibliography", "tex-math", "annotation", "object-id"}
+# article body: JATS/Elsevier body, ce:sections and xocs:rawtext (only sent with entitlement)
+_XML_BODY = {"body", "sections", "rawtext"}
+
+def _xml_text(elem) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+def _spent(elem) -> bool:
+    """Whether ``elem`` holds no text any more (its tail included)."""
+    return not len(elem) and not (elem.text or "").strip() and not (elem.tail or "").strip()
+
+def extract_xml_abstract(xml_path: Path) -> str:
+    """Text of the first abstract (JATS ``abstract``, Elsevier ``ce:abstract`` or
+    ``dc:description``); the rest of the file is not read."""
+    try:
+        for _, elem in etree.iterparse(
+            str(xml_path),
+            events=("end",),
+            tag=("{*}abstract", "{*}description"),
+            recover=True,
+            huge_tree=True,
+            resolve_entities=False,
+            no_network=True,
+            remove_comments=True,
+            remove_pis=True,
+        ):
+            text = _xml_text(elem)
+            if text:
+                return normalize_spaces(text)
+    except (etree.XMLSyntaxError, OSError, ValueError):
+        pass
+    return ""
+
+def _extract_text_from_xml(xml_path: Path) -> str:
+    return _scan_xml(xml_path)[0]
+
+def _scan_xml(xml_path: Path) -> tuple[str, bool]:
+    """One streaming pass: title, abstracts, body and tables (one line per row), and
+    whether the returned text includes body text.
+
+    Elements are cleared once their text is taken, so memory stays flat on large
+    files; nested blocks are emitted once.
+    """
+    parts: list[list[str]] = [[], [], []]
+    has_body = [False, False, False]  # per zone: some of its text came from the body
+    body_open = 0
+    zones: list[int] = []  # zone of every open zone element
+    names: list[str] = []  # local names of the open elements
+    kinds: list[str] = []  # how every open element is handled
+    skip = cells_open = blocks_open = 0
+    row: list[str] = []
+    try:
+        events = etree.iterparse(
+            str(xml_path),
+            events=("start", "end"),
+            recover=True,
+            huge_tree=True,
+            resolve_entities=False,
+            no_network=True,
+            remove_comments=True,
+            remove_pis=True,
+        )
+        for event, elem in events:
+            tag = elem.tag
+            name = tag[tag.rfind("}") + 1 :]  # local name
+            if event == "start":
+                parent = names[-1] if names else ""
+                names.append(name)
+                if name in _XML_BODY:
+                    body_open += 1
+                if skip or name in _XML_SKIP:
+                    kind = "skip"
+                    skip += 1
+                elif name in _XML_ZONES or (name == "title" and parent == "head" and not zones):
+                    kind = "zone"
+                    zones.append(_XML_ZONES.get(name, 0))  # or the ce:title of an Elsevier article
+                elif zones and name in _XML_CELLS:
+                    kind = "cell"
+                    blocks_open += 1
+                    cells_open += 1
+                elif zones and name in _XML_ROWS:
+                    kind = "row"
+                elif zones and name in _XML_BLOCKS:
+                    kind = "block"
+                    blocks_open += 1
+                else:
+                    kind = "other"
+                kinds.append(kind)
+                continue
+
+            names.pop()
+            kind = kinds.pop()
+            in_body = bool(body_open)
+            if name in _XML_BODY:
+                body_open -= 1
+            keep = False  # whether an open block still needs the element's text
+            if kind == "skip":
+                skip -= 1
+            elif kind == "zone":
+                zone = zones.pop()
+                text = _xml_text(elem)
+                if text:
+                    parts[zone].append(text)
+                    has_body[zone] = has_body[zone] or in_body
+            elif kind == "cell":
+                blocks_open -= 1
+                cells_open -= 1
+                row.append(_xml_text(elem))
+            elif kind == "row":
+                if any(row):
+                    parts[zones[-1]].append(" | ".join(row))
+                    has_body[zones[-1]] = has_body[zones[-1]] or in_body
+                row = []
+            elif kind == "block":
+                blocks_open -= 1
+                if cells_open:
+                    elem.tail = " " + (elem.tail or "")  # paragraphs of a cell stay on its line
+                    keep = True
+                else:
+                    text = _xml_text(elem)
+                    if text:
+                        parts[zones[-1]].append(text)
+                        has_body[zones[-1]] = has_body[zones[-1]] or in_body
+            elif zones:
+                # inline markup is part of the enclosing block (or of the zone's own text)
+                keep = bool(blocks_open) or bool(_xml_text(elem))
+            if keep:
+                continue
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None and not blocks_open:
+                # drop emitted siblings; stop at one whose tail still carries text
+                while len(parent) and parent[0] is not elem and _spent(parent[0]):
+                    del parent[0]
+    except (etree.XMLSyntaxError, OSError, ValueError):
+        pass
+
+    for texts, body in zip(parts, has_body):
+        if texts:
+            return normalize_spaces("\n\n".join(texts)), body
+    # no known schema: all text of the document, not known to be the body
+    try:
+        root = etree.parse(str(xml_path), etree.XMLParser(recover=True, huge_tree=True, resolve_entities=False, no_network=True))
+        return normalize_spaces(" ".join("".join(root.getroot().itertext()).split())), False
+    except Exception:
+        return "", False
+
+# a page needs at least this many ruling lines/rectangles to count as a table candidate
+TABLE_MIN_RULES = 4
+_TABLE_HINTS = (DOSE_UNITS_RE, G_UNITS_RE, TABLE_CAPTION_RE)
+
+def _count_page_objects(item, chars: list[str]) -> int:
+    rules = 0
+    for child in item:
+        if isinstance(child, (LTLine, LTRect)):
+            rules += 1
+        elif isinstance(child, LTChar):
+            chars.append(child.get_text())
+        elif isinstance(child, LTContainer):
+            rules += _count_page_objects(child, chars)
+    return rules
+
+def plan_table_pages(pdf_path: Path) -> list[int]:
+    """Cheaply pick the pages worth handing to camelot/tabula (1-based numbers).
+
+    Interprets the pages with an aggregator that has no ``LAParams``, so pdfminer
+    only collects the raw characters and lines (``extract_pages`` would substitute
+    default layout analysis for ``laparams=None``). Keeps pages with ruling lines,
+    unit patterns or a table caption.
+    """
+    pages = []
+    rsrcmgr = PDFResourceManager()
+    device = PDFPageAggregator(rsrcmgr, laparams=None)
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    with open(pdf_path, "rb") as f:
+        for page_no, pdf_page in enumerate(PDFPage.get_pages(f), start=1):
+            interpreter.process_page(pdf_page)
+            chars: list[str] = []
+            rules = _count_page_objects(device.get_result(), chars)
+            if rules >= TABLE_MIN_RULES:
+                pages.append(page_no)
+                continue
+            text = normalize_spaces("".join(chars))
+            if any(p.search(text) for p in _TABLE_HINTS):
+                pages.append(page_no)
+    return pages
+
+def _extract_tables_text(pdf_path: Path) -> str:
+    if not (HAS_CAMELOT or HAS_TABULA):
+        return ""
+    try:
+        pages = plan_table_pages(pdf_path)
+    except Exception:
+        pages = None  # planner failed: let the table libraries look at every page
+    if pages == []:
+        return ""
     # Camelot
     if HAS_CAMELOT:
         try:
             chunks = []
+            page_spec = ",".join(map(str, pages)) if pages else "all"
             for flavor in ("lattice", "stream"):
                 try:
-                    tables = camelot.read_pdf(str(pdf_path), pages="all", flavor=flavor)
+                    tables = camelot.read_pdf(str(pdf_path), pages=page_spec, flavor=flavor)
                     for t in tables:
                         df = t.df
                         chunks.append("\n".join(["\t".join(map(str, row)) for row in df.values]))
                 except Exception:
                     continue
+                if chunks:
+                    break  # the first flavor found tables: skip the second one
             if chunks:
                 return normalize_spaces("\n\n".join(chunks))
         except Exception:
@@ -59,7 +384,7 @@ def extract_tables_text(pdf_path: Path) -> str:
     # Tabula
     if HAS_TABULA:
         try:
-            dfs = tabula.read_pdf(str(pdf_path), pages="all", multiple_tables=True)
+            dfs = tabula.read_pdf(str(pdf_path), pages=pages or "all", multiple_tables=True)
             chunks = []
             for df in dfs or []:
                 try:
@@ -70,4 +395,123 @@ def extract_tables_text(pdf_path: Path) -> str:
                 return normalize_spaces("\n\n".join(chunks))
         except Exception:
             pass
-    return ""
\ No newline at end of file
+    return ""
+
+# --- process pool ---
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+class ExtractionError(RuntimeError):
+    """The extraction workers crashed on a task twice: there is no result, not even an empty one."""
+
+
+def _init_worker() -> None:
+    """Runs once per worker process: heavy imports happen here, not per task."""
+    # Ctrl+C is for the parent, which drains the pipeline; workers finish their task
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import pdfminer.layout  # noqa: F401
+    for name in ["pdfminer", "camelot", "tabula"]:
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def _ping() -> bool:
+    return True
+
+
+def start_pool() -> ProcessPoolExecutor | None:
+    """Create and warm the extraction pool (``config.EXTRACT_WORKERS`` processes).
+
+    Call before starting other threads so workers are forked from a quiet process.
+    Returns ``None`` when ``EXTRACT_WORKERS`` is 0 (extraction runs in-process).
+    """
+    global _pool
+    if config.EXTRACT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=config.EXTRACT_WORKERS, initializer=_init_worker)
+            for f in [_pool.submit(_ping) for _ in range(config.EXTRACT_WORKERS)]:
+                f.result()
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died (e.g. native crash in a PDF library)."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(func, *args) -> Future:
+    pool = start_pool()
+    if pool is None:
+        future: Future = Future()
+        future.set_result(func(*args))
+        return future
+    try:
+        return pool.submit(func, *args)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return start_pool().submit(func, *args)
+
+
+def _result(future: Future, func, *args, default=""):
+    """Result of ``future``, the pool task ``func(*args)``; ``default`` when it failed.
+
+    A task lost because a worker crashed (its own or another one's) runs once more
+    on a restarted pool; when that crashes too, ``ExtractionError`` is raised.
+    """
+    for attempt in range(2):
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            if attempt:
+                raise ExtractionError(f"extraction workers crashed on {func.__name__}") from None
+            future = _submit(func, *args)
+        except Exception:
+            return default
+
+
+def extract_pdf(pdf_path: Path, tables: bool = True) -> tuple[str, str]:
+    """Extract text and table text of ``pdf_path`` in parallel on the process pool."""
+    text = extract_cache.lookup(pdf_path, "pdf_text", EXTRACTOR_VERSIONS["pdf_text"])
+    tables_text = extract_cache.lookup(pdf_path, "pdf_tables", EXTRACTOR_VERSIONS["pdf_tables"]) if tables else ""
+    text_future = _submit(extract_text_from_pdf, pdf_path) if text is None else None
+    tables_future = _submit(extract_tables_text, pdf_path) if tables_text is None else None
+    if text_future is not None:
+        text = _result(text_future, extract_text_from_pdf, pdf_path)
+    if tables_future is not None:
+        tables_text = _result(tables_future, extract_tables_text, pdf_path)
+    return text, tables_text
+
+
+def probe_pdf(pdf_path: Path) -> str:
+    """``extract_first_pages`` on the process pool: one or two pages of layout analysis."""
+    return _result(_submit(extract_first_pages, pdf_path), extract_first_pages, pdf_path)
+
+
+def match_pdf(pdf_path: Path, patterns: list) -> bool | None:
+    """Early-exit full-text check on the process pool.
+
+    Text pages are scanned first; table extraction runs only if no page matched.
+    Returns ``True``/``False`` for matched/not matched and ``None`` when the PDF
+    yielded no text at all.
+    """
+    matched, text = _result(_submit(scan_pdf, pdf_path, patterns), scan_pdf, pdf_path, patterns, default=(False, ""))
+    if matched:
+        return True
+    tables_text = _result(_submit(extract_tables_text, pdf_path), extract_tables_text, pdf_path)
+    if tables_text and any(p.search(tables_text) for p in patterns):
+        return True
+    return False if (text or tables_text) else None
@@ -0,0 +1,111 @@
+"""Content-addressed cache of extracted text, keyed by the SHA-256 of the source file."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import config
+from sqlite_store import ThreadConnections, evict_lru
+
+_DIGEST_MEMO_SIZE = 1024
+
+_digests: OrderedDict[tuple, str] = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def _setup(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS extract ("
+        "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS extract_used ON extract(used)")
+
+
+_connections = ThreadConnections(_setup)
+
+
+def _connect() -> sqlite3.Connection:
+    return _connections.get(Path(config.CACHE_DIR) / "extract.sqlite")
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of the file content, memoized per (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+        if digest is not None:
+            _digests.move_to_end(memo_key)
+            return digest
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[memo_key] = digest
+        while len(_digests) > _DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+def make_key(path: Path, extractor: str, version: str) -> str:
+    return f"{file_digest(path)}:{extractor}:{version}"
+
+
+def get(key: str) -> str | None:
+    try:
+        conn = _connect()
+        row = conn.execute("SELECT data FROM extract WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE extract SET used = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(row[0]).decode("utf-8")
+    except Exception:
+        return None
+
+
+def put(key: str, text: str) -> None:
+    try:
+        conn = _connect()
+        blob = zlib.compress(text.encode("utf-8"), 6)
+        conn.execute(
+            "INSERT OR REPLACE INTO extract (key, data, size, used) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        if _connections.count_put():
+            evict_lru(conn, "extract", config.EXTRACT_CACHE_MAX_BYTES)
+    except Exception:
+        pass
+
+
+def lookup(path: Path, extractor: str, version: str) -> str | None:
+    """Cached result for ``path`` or ``None`` (also when caching is disabled)."""
+    if not config.EXTRACT_CACHE_ENABLED:
+        return None
+    try:
+        return get(make_key(path, extractor, version))
+    except OSError:
+        return None
+
+
+def cached(path: Path, extractor: str, version: str, func) -> str:
+    """Return ``func(path)`` from the cache, computing and storing it on a miss."""
+    if not config.EXTRACT_CACHE_ENABLED:
+        return func(path)
+    try:
+        key = make_key(path, extractor, version)
+    except OSError:
+        return func(path)
+    text = get(key)
+    if text is None:
+        text = func(path)
+        put(key, text)
+    return text
@@ -0,0 +1,135 @@
+"""Persistent cache of search API responses with per-endpoint TTLs and revalidation.
+
+Entries are keyed by the normalized request URL (query parameters sorted, credentials
+such as ``apiKey`` removed) and stored zlib-compressed in ``CACHE_DIR/http.sqlite``.
+Only endpoints listed in ``config.HTTP_CACHE_TTLS`` are cached.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+import sqlite3
+import time
+import zlib
+
+import config
+from sqlite_store import ThreadConnections, evict_lru
+
+# query parameters that identify the caller, not the result
+_PRIVATE_PARAMS = {"apikey", "api_key", "insttoken", "mailto", "email"}
+
+@dataclass
+class Entry:
+    body: bytes
+    headers: dict[str, str]
+    etag: str | None
+    last_modified: str | None
+    expires: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+
+def _setup(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS http ("
+        "key TEXT PRIMARY KEY, body BLOB NOT NULL, content_type TEXT, etag TEXT, "
+        "last_modified TEXT, expires REAL NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS http_used ON http(used)")
+
+
+_connections = ThreadConnections(_setup)
+
+
+def _connect() -> sqlite3.Connection:
+    return _connections.get(Path(config.CACHE_DIR) / "http.sqlite")
+
+
+def ttl_for(url: str) -> float | None:
+    """TTL in seconds of the most specific ``config.HTTP_CACHE_TTLS`` entry matching ``url``."""
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+    parsed = urlparse(url)
+    target = (parsed.hostname or "").lower() + (parsed.path or "")
+    best = None
+    for key in config.HTTP_CACHE_TTLS:
+        if target.startswith(key) and (best is None or len(key) > len(best)):
+            best = key
+    return config.HTTP_CACHE_TTLS[best] if best is not None else None
+
+
+def make_key(url: str, params=None) -> str:
+    """Normalized URL: lower-case host, sorted query parameters, credentials removed."""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        query += [(str(k), str(v)) for k, v in items if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in _PRIVATE_PARAMS)
+    return urlunparse(
+        (parsed.scheme, (parsed.netloc or "").lower(), parsed.path, "", urlencode(query), "")
+    )
+
+
+def get(key: str) -> Entry | None:
+    try:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT body, content_type, etag, last_modified, expires FROM http WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE http SET used = ? WHERE key = ?", (time.time(), key))
+        body, content_type, etag, last_modified, expires = row
+        headers = {"Content-Type": content_type} if content_type else {}
+        return Entry(zlib.decompress(body), headers, etag, last_modified, expires)
+    except Exception:
+        return None
+
+
+def put(key: str, body: bytes, headers, ttl: float) -> None:
+    try:
+        conn = _connect()
+        blob = zlib.compress(body, 6)
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO http "
+            "(key, body, content_type, etag, last_modified, expires, size, used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                blob,
+                headers.get("Content-Type"),
+                headers.get("ETag"),
+                headers.get("Last-Modified"),
+                now + ttl,
+                len(blob),
+                now,
+            ),
+        )
+        if _connections.count_put():
+            _evict(conn)
+    except Exception:
+        pass
+
+
+def refresh(key: str, ttl: float) -> None:
+    """Extend the lifetime of an entry the server confirmed as unchanged (304)."""
+    try:
+        now = time.time()
+        _connect().execute("UPDATE http SET expires = ?, used = ? WHERE key = ?", (now + ttl, now, key))
+    except Exception:
+        pass
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Drop expired entries without validators, then least recently used ones above the cap."""
+    conn.execute(
+        "DELETE FROM http WHERE expires < ? AND etag IS NULL AND last_modified IS NULL",
+        (time.time(),),
+    )
+    evict_lru(conn, "http", config.HTTP_CACHE_MAX_BYTES)
@@ -0,0 +1,215 @@
+"""Process-wide HTTP client with keep-alive connection pools per host."""
+from __future__ import annotations
+
+import atexit
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import http_cache
+import ratelimit
+import resilience
+
+# optional dependency for HTTP/2
+HAS_HTTP2 = False
+try:
+    import httpx  # type: ignore
+    import h2  # type: ignore  # noqa: F401
+    HAS_HTTP2 = True
+except Exception:
+    pass
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_h2_client = None
+
+
+class _Http2Response:
+    """Minimal ``requests.Response`` look-alike wrapping an ``httpx`` response."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        self._response.read()
+        return self._response.json()
+
+    def iter_content(self, chunk_size: int = 65536):
+        return self._response.iter_bytes(chunk_size)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} {self.reason} for url: {self.url}", response=self)
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class _CachedResponse:
+    """``requests.Response`` look-alike served from ``http_cache``."""
+
+    status_code = 200
+    reason = "OK"
+
+    def __init__(self, url: str, entry: http_cache.Entry):
+        self.url = url
+        self.headers = requests.structures.CaseInsensitiveDict(entry.headers)
+        self.content = entry.body
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get("Content-Type") or ""
+        encoding = requests.utils.get_encoding_from_headers({"content-type": content_type})
+        return self.content.decode(encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 65536):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def get_session() -> requests.Session:
+    """Return the shared ``requests`` session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=config.HTTP_POOL_MAXSIZE,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _get_h2_client():
+    global _h2_client
+    if _h2_client is None:
+        with _lock:
+            if _h2_client is None:
+                _h2_client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=config.HTTP_POOL_CONNECTIONS * config.HTTP_POOL_MAXSIZE,
+                        max_keepalive_connections=config.HTTP_POOL_CONNECTIONS,
+                    ),
+                )
+    return _h2_client
+
+
+def get(
+    url: str,
+    *,
+    params=None,
+    headers: dict[str, str] | None = None,
+    stream: bool = False,
+    timeout: float | None = None,
+    allow_redirects: bool = True,
+    cache: bool = False,
+    refresh: bool = False,
+):
+    """Issue a rate-limited GET through the shared pooled client (HTTP/2 when enabled).
+
+    Transient failures are retried and failing hosts are cut off by ``resilience``.
+
+    With ``cache=True`` responses of endpoints listed in ``config.HTTP_CACHE_TTLS`` are
+    served from ``http_cache`` while fresh and revalidated with ETag/Last-Modified after;
+    ``refresh=True`` skips the cached copy but stores the new response.
+    """
+    ttl = http_cache.ttl_for(url) if cache and not stream else None
+    if ttl is None:
+        return _send(url, params, headers, stream, timeout, allow_redirects)
+
+    key = http_cache.make_key(url, params)
+    entry = None if refresh else http_cache.get(key)
+    if entry is not None and entry.fresh:
+        return _CachedResponse(url, entry)
+    if entry is not None:
+        headers = dict(headers or {})
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    response = _send(url, params, headers, stream, timeout, allow_redirects)
+    if entry is not None and response.status_code == 304:
+        response.close()
+        http_cache.refresh(key, ttl)
+        return _CachedResponse(url, entry)
+    if response.status_code == 200:
+        http_cache.put(key, response.content, response.headers, ttl)
+    return response
+
+
+def _send(url, params, headers, stream, timeout, allow_redirects):
+    timeout = config.REQUESTS_TIMEOUT if timeout is None else timeout
+    return resilience.call(
+        url,
+        lambda: _attempt(url, params, headers, stream, timeout, allow_redirects),
+        wait=lambda: ratelimit.acquire(url),
+    )
+
+
+def _attempt(url, params, headers, stream, timeout, allow_redirects):
+    if config.HTTP2_ENABLED and HAS_HTTP2:
+        client = _get_h2_client()
+        request = client.build_request("GET", url, params=params, headers=headers, timeout=timeout)
+        try:
+            response = _Http2Response(client.send(request, stream=stream, follow_redirects=allow_redirects))
+        except httpx.TimeoutException as e:  # surfaced as requests errors so resilience retries them
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+    else:
+        response = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            stream=stream,
+            timeout=timeout,
+            allow_redirects=allow_redirects,
+        )
+    ratelimit.observe(url, response)
+    return response
+
+
+def close() -> None:
+    """Close pooled connections (called automatically at interpreter exit)."""
+    global _session, _h2_client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _h2_client is not None:
+            _h2_client.close()
+            _h2_client = None
+
+
+atexit.register(close)
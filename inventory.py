@@ -1,8 +1,14 @@
 # articles_parser/inventory.py
+"""Inventory of processed records, stored in SQLite (WAL) and exported to CSV on demand."""
+from __future__ import annotations
+
+from pathlib import Path
 import csv
 import os
-import pandas as pd
+import sqlite3
+import threading
 import config
+from sqlite_store import ThreadConnections
 
 COLUMNS = [
     "doi", "title", "source", "keyword",
@@ -12,44 +18,202 @@ COLUMNS = [
     "notes",
 ]
 
-def load_seen_inventory() -> set[str]:
-    seen = set()
-    if config.LOG_INVENTORY.exists():
+# notes that define a row's indexed status, most significant first
+_STATUS_NOTES = [
+    "download_failed",
+    "skip:abstract_filter",
+    "skip:fulltext_filter",
+    "downloaded after retry",
+]
+
+_schema_lock = threading.Lock()
+
+
+def _status(notes: str | None) -> str:
+    parts = {n.strip() for n in (notes or "").split(",")}
+    for note in _STATUS_NOTES:
+        if note in parts:
+            return note
+    return "ok"
+
+
+def _to_text(value) -> str:
+    """Store values the way csv.DictWriter renders them (None -> '', True -> 'True')."""
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _setup(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA synchronous=" + ("NORMAL" if config.LOG_DURABILITY == "none" else "FULL"))
+    conn.execute("PRAGMA busy_timeout=60000")
+
+
+_connections = ThreadConnections(_setup, timeout=60)
+
+
+def _connect() -> sqlite3.Connection:
+    """Connection of this thread to the current ``LOG_INVENTORY_DB``."""
+    return _connections.get(Path(config.LOG_INVENTORY_DB))
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create the table and indexes; returns True when the table was just created."""
+    with _schema_lock:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inventory'"
+        ).fetchone()
+        if exists:
+            return False
+        columns = ", ".join(f"{c} TEXT" for c in COLUMNS)
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            df = pd.read_csv(config.LOG_INVENTORY)
-            for doi in df["doi"].dropna().tolist():
-                seen.add(str(doi).strip().lower())
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS inventory (id INTEGER PRIMARY KEY, {columns}, status TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS inventory_doi ON inventory(doi)")
+            conn.execute("CREATE INDEX IF NOT EXISTS inventory_status ON inventory(status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS inventory_notes ON inventory(notes)")
+            conn.execute("CREATE INDEX IF NOT EXISTS inventory_keyword ON inventory(keyword)")
+            conn.execute("COMMIT")
         except Exception:
-            pass
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+
+def _insert(conn: sqlite3.Connection, rows: list[dict]) -> None:
+    placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+    values = [
+        [_to_text(r.get(k)) for k in COLUMNS] + [_status(_to_text(r.get("notes")))]
+        for r in rows
+    ]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            f"INSERT INTO inventory ({', '.join(COLUMNS)}, status) VALUES ({placeholders})",
+            values,
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _import_csv(conn: sqlite3.Connection, csv_path: Path) -> None:
+    """Load a legacy ``inventory.csv`` into a freshly created database."""
+    with csv_path.open("r", newline="", encoding="utf-8") as f:
+        batch = []
+        for row in csv.DictReader(f):
+            batch.append(row)
+            if len(batch) >= 5000:
+                _insert(conn, batch)
+                batch = []
+        if batch:
+            _insert(conn, batch)
+
+
+def load_seen_inventory() -> set[str]:
+    seen = set()
+    ensure_inventory_file()
+    try:
+        for (doi,) in _connect().execute("SELECT DISTINCT doi FROM inventory WHERE doi != ''"):
+            seen.add(str(doi).strip().lower())
+    except Exception:
+        pass
     return seen
 
+
 def ensure_inventory_file():
-    """Create CSV with header if it doesn't exist (fsync immediately)."""
-    if not config.LOG_INVENTORY.exists():
-        config.LOG_INVENTORY.parent.mkdir(parents=True, exist_ok=True)
-        with config.LOG_INVENTORY.open("w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=COLUMNS)
-            w.writeheader()
-            f.flush()
-            os.fsync(f.fileno())
+    """Create the inventory database if needed, importing an existing CSV inventory."""
+    conn = _connect()
+    if _ensure_schema(conn) and config.LOG_INVENTORY.exists():
+        _import_csv(conn, config.LOG_INVENTORY)
+
 
 def append_inventory_row(row: dict, flush: bool = True):
-    """Append a row to CSV. Flush/fsync by default for real-time progress."""
-    if not config.LOG_INVENTORY.exists():
-        ensure_inventory_file()
-    with config.LOG_INVENTORY.open("a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=COLUMNS)
-        w.writerow({k: row.get(k) for k in COLUMNS})
-        if flush:
-            f.flush()
-            os.fsync(f.fileno())
+    """Insert one row; the transaction is committed (and synced) immediately.
 
-# Legacy batch writing (kept for compatibility)
-def update_inventory(rows: list[dict]):
+    ``flush`` is kept for compatibility with the former CSV writer.
+    """
+    append_inventory_rows([row])
+
+
+def append_inventory_rows(rows: list[dict]) -> None:
+    """Insert many rows in a single transaction."""
+    if not rows:
+        return
+    ensure_inventory_file()
+    _insert(_connect(), rows)
+
+
+def iter_inventory_rows(status: str | None = None):
+    """Yield inventory rows as dicts (with their ``id``), optionally only one status."""
     ensure_inventory_file()
-    with config.LOG_INVENTORY.open("a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=COLUMNS)
-        for r in rows:
-            w.writerow({k: r.get(k) for k in COLUMNS})
+    conn = _connect()
+    query = f"SELECT id, {', '.join(COLUMNS)} FROM inventory"
+    params: tuple = ()
+    if status is not None:
+        query += " WHERE status = ?"
+        params = (status,)
+    cursor = conn.execute(query + " ORDER BY id", params)
+    names = ["id"] + COLUMNS
+    for values in cursor:
+        yield dict(zip(names, values))
+
+
+def update_inventory_row(row_id: int, fields: dict) -> None:
+    """Update columns of one row in place (the status follows ``notes``)."""
+    fields = {k: _to_text(v) for k, v in fields.items() if k in COLUMNS}
+    if not fields:
+        return
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    params = list(fields.values())
+    if "notes" in fields:
+        assignments += ", status = ?"
+        params.append(_status(fields["notes"]))
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"UPDATE inventory SET {assignments} WHERE id = ?", params + [row_id])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def update_inventory_keywords(keywords: dict[str, str]) -> None:
+    """Set the ``keyword`` column of the latest row of each DOI in one transaction."""
+    if not keywords:
+        return
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "UPDATE inventory SET keyword = ? "
+            "WHERE id = (SELECT MAX(id) FROM inventory WHERE doi = ?)",
+            [(kw, doi) for doi, kw in keywords.items()],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def export_inventory_csv(path: str | Path | None = None) -> Path:
+    """Write the inventory as CSV (default ``config.LOG_INVENTORY``) and return its path."""
+    target = Path(path) if path is not None else config.LOG_INVENTORY
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(iter_inventory_rows())
         f.flush()
         os.fsync(f.fileno())
+    os.replace(tmp, target)
+    return target
+
+# Legacy batch writing (kept for compatibility)
+def update_inventory(rows: list[dict]):
+    append_inventory_rows(rows)
@@ -0,0 +1,173 @@
+"""Write-behind logger that group-commits inventory rows and DOI log lines.
+
+A background thread keeps the DOI log files open and commits queued writes every
+``config.LOG_FLUSH_ROWS`` items or ``config.LOG_FLUSH_INTERVAL_MS`` milliseconds.
+``config.LOG_DURABILITY`` selects how hard a commit is:
+
+* ``"always"`` -- commit and fsync every single write (the former behaviour)
+* ``"batch"``  -- group commit with one fsync per batch
+* ``"none"``   -- group commit without fsync (the OS decides when data hits the disk)
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import atexit
+import os
+import queue
+import signal
+import threading
+import time
+
+import config
+import inventory
+
+_FLUSH = "flush"
+_ROW = "row"
+_LINE = "line"
+
+
+class GroupCommitWriter:
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._files: dict[Path, object] = {}
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="logwriter", daemon=True)
+                self._thread.start()
+
+    def write_row(self, row: dict) -> None:
+        self.start()
+        self._queue.put((_ROW, dict(row)))
+
+    def write_line(self, path: Path, line: str) -> None:
+        self.start()
+        self._queue.put((_LINE, Path(path), line))
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until everything queued so far has been committed."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            for f in self._files.values():
+                try:
+                    f.close()
+                except Exception:
+                    pass
+            self._files.clear()
+
+    def _run(self) -> None:
+        rows: list[dict] = []
+        lines: list[tuple[Path, str]] = []
+        first_pending: float | None = None
+        while True:
+            interval = config.LOG_FLUSH_INTERVAL_MS / 1000
+            timeout = None
+            if first_pending is not None:
+                timeout = max(0.0, first_pending + interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            waiter = None
+            if item is not None:
+                if item[0] == _FLUSH:
+                    waiter = item[1]
+                elif item[0] == _ROW:
+                    rows.append(item[1])
+                else:
+                    lines.append((item[1], item[2]))
+            pending = len(rows) + len(lines)
+            if pending and first_pending is None:
+                first_pending = time.monotonic()
+
+            due = (
+                item is None
+                or waiter is not None
+                or config.LOG_DURABILITY == "always"
+                or pending >= config.LOG_FLUSH_ROWS
+                or (first_pending is not None and time.monotonic() - first_pending >= interval)
+            )
+            if due and pending:
+                self._commit(rows, lines)
+                rows, lines = [], []
+                first_pending = None
+            if waiter is not None:
+                waiter.set()
+
+    def _commit(self, rows: list[dict], lines: list[tuple[Path, str]]) -> None:
+        if rows:
+            try:
+                inventory.append_inventory_rows(rows)
+            except Exception as e:
+                print(f"Failed to write {len(rows)} inventory rows: {e}", flush=True)
+        touched = {}
+        with self._lock:
+            for path, line in lines:
+                try:
+                    f = self._files.get(path)
+                    if f is None:
+                        f = path.open("a", encoding="utf-8")
+                        self._files[path] = f
+                    f.write(line + "\n")
+                    touched[path] = f
+                except Exception as e:
+                    print(f"Failed to write to {path}: {e}", flush=True)
+            for f in touched.values():
+                try:
+                    f.flush()
+                    if config.LOG_DURABILITY != "none":
+                        os.fsync(f.fileno())
+                except Exception:
+                    pass
+
+
+_writer = GroupCommitWriter()
+
+
+def start() -> None:
+    """Start the writer thread and make SIGTERM flush before exiting (main thread only)."""
+    _writer.start()
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _on_sigterm)
+    except (ValueError, AttributeError, OSError):
+        pass
+
+
+def _on_sigterm(signum, frame):
+    # SystemExit runs atexit handlers, which flush the writer
+    raise SystemExit(128 + signum)
+
+
+def write_row(row: dict) -> None:
+    _writer.write_row(row)
+
+
+def write_line(path: Path, line: str) -> None:
+    _writer.write_line(path, line)
+
+
+def flush(timeout: float | None = None) -> None:
+    _writer.flush(timeout)
+
+
+def close() -> None:
+    _writer.close()
+
+
+atexit.register(close)
@@ -17,3 +17,6 @@ G_UNITS = (
 )
 G_UNITS_RE = re.compile(G_UNITS, re.IGNORECASE)
 
+
+# table captions ("Table 2", "TABLE IV")
+TABLE_CAPTION_RE = re.compile(r'\btable\s+(?:\d+|[IVXLC]+)\b', re.IGNORECASE)
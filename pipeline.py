@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-import csv
 import re
+import signal
+import threading
 import config
+import logwriter
+import resilience
+from checkpoint import Checkpoint
 from utils import (
     ensure_dirs,
+    keyword_groups,
     norm_doi,
     doi_to_fname,
     normalize_spaces,
@@ -13,35 +20,68 @@ from utils import (
     delete_if_exists,
 )
 from search import (
-    search_openalex,
-    search_europe_pmc,
-    search_arxiv,
-    search_sciencedirect,
-    search_crossref,
+    Record,
+    SearchFilters,
+    iter_openalex,
+    iter_europe_pmc,
+    iter_arxiv,
+    iter_sciencedirect,
+    iter_crossref,
+    fetch_abstracts,
+    year_counts_openalex,
+    year_counts_crossref,
+    count_europe_pmc,
+)
+from search.shards import (
+    bisect_year_shards,
+    iter_sharded,
+    plan_year_shards,
+    shard_filters,
+    shard_label,
+    year_bounds,
 )
 from download import (
     try_download_pdf_with_validation,
     try_download_xml,
+    prefetch_xml,
     download_via_libgen_stub,
     append_line,
 )
-from extract import extract_text_from_pdf, extract_text_from_xml, extract_tables_text
-from inventory import load_seen_inventory, ensure_inventory_file, append_inventory_row
+from extract import (
+    ExtractionError,
+    extract_pdf,
+    extract_text_from_xml,
+    extract_xml_abstract,
+    extract_xml_fulltext,
+    match_pdf,
+    probe_pdf,
+    shutdown_pool,
+    start_pool,
+)
+from inventory import (
+    load_seen_inventory,
+    ensure_inventory_file,
+    iter_inventory_rows,
+    update_inventory_row,
+    update_inventory_keywords,
+    export_inventory_csv,
+)
+from stages import BatchStage, Producer, Stage, make_queue, iter_queue
 import logging
 for name in ["pdfminer", "camelot", "tabula"]:
     logging.getLogger(name).setLevel(logging.ERROR)
 
-def _merge_sources(*dicts) -> dict[str, dict]:
-    db: dict[str, dict] = {}
-    for d in dicts:
-        for rec_id, rec in d.items():
-            if rec_id not in db:
-                db[rec_id] = rec
-            else:
-                for k in ["pdf_url", "xml_url"]:
-                    if not db[rec_id].get(k) and rec.get(k):
-                        db[rec_id][k] = rec[k]
-    return db
+# sources whose query syntax supports OR-combining all keywords into one search
+_COMBINABLE_SOURCES = {"openalex", "europepmc", "arxiv"}
+KEYWORD_SEPARATOR = "; "  # between keywords in the inventory ``keyword`` column
+_SHARDABLE_SOURCES = {"openalex", "crossref", "europepmc"}
+
+def _merge_links(target: Record, rec: Record) -> None:
+    """Keep the links ``target`` lacks from another copy of the same record."""
+    if not target.pdf_url and rec.pdf_url:
+        target.pdf_url = rec.pdf_url
+    if not target.xml_url and rec.xml_url:
+        target.xml_url = rec.xml_url
 
 
 def _extract_abstract_from_text(full_text: str) -> str:
@@ -83,6 +123,482 @@ def _format_check_result(value: bool | str | None) -> str:
     return "passed" if value else "failed"
 
 
+@dataclass
+class _Options:
+    abstract_filter: bool
+    abstract_res: list[re.Pattern]
+    fulltext_filter: bool
+    fulltext_res: list[re.Pattern]
+    oa_only: bool
+    libgen_domain: str | None
+    verbose: bool
+    save_text: bool
+    prefer_xml: bool = False
+    probe_abstracts: bool = False
+
+
+@dataclass
+class _Job:
+    """State of one record while it moves through the pipeline stages."""
+
+    rec_id: str
+    nd: str
+    rec: Record
+    keywords: list[str]
+    title: str = ""
+    abstract: str = ""
+    abstract_available: bool | None = False
+    notes: list[str] = field(default_factory=list)
+    report_lines: list[str] = field(default_factory=list)
+    abstract_matched: bool | None = True
+    pdf_ok: bool = False
+    xml_ok: bool = False
+    xml_decision: bool | None = None  # fulltext patterns matched in the XML (None: not decided)
+    fulltext_matched: bool | None = None
+    direct_status: str | None = None
+    libgen_status: str | None = None
+    fulltext_message: str | None = None
+    finished: bool = False  # no download/extraction needed anymore
+    retry_later: bool = False  # extraction crashed: no inventory row, searched again next run
+
+    def row(self) -> dict:
+        return {
+            "doi": self.nd,
+            "title": self.title,
+            "source": self.rec.source,
+            "keyword": KEYWORD_SEPARATOR.join(self.keywords),
+            "abstract_available": self.abstract_available,
+            "abstract_matched": self.abstract_matched,
+            "pdf_downloaded": self.pdf_ok,
+            "xml_downloaded": self.xml_ok,
+            "fulltext_matched": self.fulltext_matched,
+            "notes": ",".join(self.notes) if self.notes else "",
+        }
+
+
+class _Scheduler:
+    """Deduplicate records on the fly against the inventory, across sources and keywords.
+
+    Keywords of duplicates are merged into the pending job; for records already written
+    in this run they are collected in ``late_keywords`` for a final inventory update.
+    """
+
+    def __init__(self, seen: set[str], checkpoint: Checkpoint):
+        self.seen = seen
+        self.checkpoint = checkpoint
+        self.pending: dict[str, _Job] = {}
+        self.recorded: dict[str, list[str]] = {}  # keywords written for this run's records
+        self.late_keywords: set[str] = set()
+        self.totals: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def admit(self, item: tuple[tuple[str, ...], str, Record]) -> _Job | None:
+        kws, rec_id, rec = item
+        nd = norm_doi(rec_id) or rec_id
+        with self._lock:
+            for kw in kws:
+                self.totals.setdefault(kw, set()).add(nd)
+            job = self.pending.get(nd)
+            if job is not None:
+                # same record from another source or keyword: keep what the first one lacked
+                _merge_links(job.rec, rec)
+                job.keywords.extend(kw for kw in kws if kw not in job.keywords)
+                return None
+            if nd in self.seen:
+                recorded = self.recorded.get(nd)
+                if recorded is not None and not set(kws) <= set(recorded):
+                    recorded.extend(kw for kw in kws if kw not in recorded)
+                    self.late_keywords.add(nd)
+                self.checkpoint.remove_inflight(nd)
+                return None
+            self.seen.add(nd)
+            job = _Job(rec_id=rec_id, nd=nd, rec=rec, keywords=list(kws))
+            self.pending[nd] = job
+            return job
+
+    def release(self, job: _Job) -> None:
+        """Stop merging into ``job``; call before its inventory row is built."""
+        with self._lock:
+            self.pending.pop(job.nd, None)
+            self.recorded[job.nd] = list(job.keywords)
+
+    def drop(self, job: _Job) -> None:
+        """Forget ``job`` without an inventory row."""
+        with self._lock:
+            self.pending.pop(job.nd, None)
+
+    def keyword_updates(self) -> dict[str, str]:
+        with self._lock:
+            return {nd: KEYWORD_SEPARATOR.join(self.recorded[nd]) for nd in self.late_keywords}
+
+
+def _phrase(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _matched_keywords(rec: Record, terms: list[str]) -> tuple[str, ...]:
+    """Keywords of an OR query found in the record's title or abstract (all if none is)."""
+    if len(terms) == 1:
+        return (terms[0],)
+    phrases = [(t, _phrase(t)) for t in terms]
+    title = _phrase(rec.title)
+    found = [t for t, p in phrases if p in title]
+    if len(found) < len(terms):
+        abstract = _phrase(rec.abstract)  # built lazily, only when the title is not enough
+        found = [t for t, p in phrases if p in title or p in abstract]
+    return tuple(found) or tuple(terms)
+
+
+def _plan_shards(source: str, terms: list[str], filters: SearchFilters | None) -> list[tuple]:
+    """Publication-year shards of about ``config.SHARD_TARGET`` hits for one query."""
+    target = config.SHARD_TARGET
+    if source == "openalex":
+        return plan_year_shards(year_counts_openalex(terms, filters), target)
+    if source == "crossref":
+        return plan_year_shards(year_counts_crossref(terms, filters), target)
+    if source == "europepmc":
+        def count(first, last):
+            return count_europe_pmc(terms, shard_filters(filters, first, last))
+
+        return bisect_year_shards(count, *year_bounds(filters), target)
+    return [(None, None)]
+
+
+def _iter_keywords(
+    search_func,
+    groups: list[tuple[str, list[str]]],
+    max_records: int,
+    position: int,
+    source: str,
+    checkpoint: Checkpoint,
+    stop: threading.Event,
+    options: dict | None = None,
+    sharded: bool = False,
+):
+    """Search one source query by query, resuming from and updating ``checkpoint``.
+
+    ``groups`` are ``(label, keywords)`` pairs from ``keyword_groups``; ``options`` are
+    extra keyword arguments for ``search_func``. With ``sharded`` a query with more
+    than ``config.SHARD_TARGET`` hits is paged as year ranges in parallel; the plan is
+    kept as the query's cursor and every shard has its own progress entry.
+    """
+    for label, terms in groups:
+        progress = checkpoint.progress(source, label)
+        extra = dict(options or {})
+        if len(terms) > 1:
+            extra["combine"] = True
+        shards = None
+        sharding = sharded and max_records > config.SHARD_TARGET
+        if sharding and not progress["done"] and progress["cursor"] is None:
+            plan = _plan_shards(source, terms, extra.get("filters"))
+            if len(plan) > 1:  # one shard (few hits, failed count): page the query as usual
+                progress["cursor"] = [list(s) for s in plan]
+        if isinstance(progress["cursor"], list):
+            if sharding and len(progress["cursor"]) > 1:
+                shards = [tuple(s) for s in progress["cursor"]]
+            else:
+                progress.update(cursor=None, collected=0)  # shard plan of a sharded run
+        if shards:
+            shard_progress = {s: checkpoint.progress(source, f"{label} [{shard_label(s)}]") for s in shards}
+            items = iter_sharded(
+                search_func, terms, shards, max_records, shard_progress.__getitem__, position=position, **extra
+            )
+        else:
+            shard_progress = None
+            items = search_func(terms, max_records, position=position, state={label: progress}, **extra)
+        found = 0
+        try:
+            for rec_id, rec in items:
+                if stop.is_set():
+                    return
+                found += 1
+                kws = _matched_keywords(rec, terms)
+                checkpoint.add_inflight(norm_doi(rec_id) or rec_id, kws, rec_id, rec)
+                yield kws, rec_id, rec
+                checkpoint.maybe_save()
+        finally:
+            items.close()
+        if stop.is_set():
+            return
+        if shard_progress is not None:
+            progress["done"] = found >= max_records or all(p["done"] for p in shard_progress.values())
+
+
+def _install_sigint(stop: threading.Event):
+    """First Ctrl+C stops the searches and lets queued records drain; a second one aborts."""
+    if threading.current_thread() is not threading.main_thread():
+        return None
+
+    def handler(signum, frame):
+        if stop.is_set():
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            raise KeyboardInterrupt
+        stop.set()
+        print("\nInterrupted: finishing records in progress (Ctrl+C again to abort)...", flush=True)
+
+    try:
+        return signal.signal(signal.SIGINT, handler)
+    except ValueError:
+        return None
+
+
+def _screen_abstract(job: _Job, opts: _Options) -> _Job:
+    rec = job.rec
+    job.title = rec.title.replace("\n", " ").replace("\r", " ")
+    job.abstract_available = rec.has_abstract
+    job.report_lines = [
+        f"- DOI: {job.nd}",
+        f"  Source: {rec.source or 'unknown'}",
+    ]
+
+    if opts.abstract_filter:
+        job.abstract = rec.abstract
+        job.abstract_available = bool(job.abstract)
+        if job.abstract:
+            combined_text = f"{job.title}\n{job.abstract}"
+            if any(p.search(combined_text) for p in opts.abstract_res):
+                abstract_status = "patterns in abstract"
+                job.abstract_matched = True
+            else:
+                job.abstract_matched = False
+                abstract_status = "patterns not in abstract"
+                job.notes.append("skip:abstract_filter")
+        else:
+            job.abstract_matched = None
+            abstract_status = "abstract not found"
+            job.notes.append("abstract_not_found")
+        job.report_lines.append(f"  Abstract filter: {abstract_status}")
+
+    if opts.abstract_filter and job.abstract_matched is False:
+        job.direct_status = (
+            "not attempted (abstract filter not matched)"
+            if rec.pdf_url
+            else "no direct link provided"
+        )
+        job.libgen_status = "not attempted (abstract filter not matched)"
+        if opts.fulltext_filter:
+            job.fulltext_matched = False
+            job.fulltext_message = "Fulltext filter: not run (abstract filter not matched)"
+        job.finished = True
+    else:
+        prefetch_xml(job.rec_id, rec.xml_url)  # admitted: fetched while it waits for a download worker
+    return job
+
+
+def _enrich_abstracts(jobs: list[_Job]) -> list[_Job]:
+    """Look up the abstracts records arrived without, for a whole batch at once."""
+    missing = {
+        job.nd: job
+        for job in jobs
+        if not job.rec.has_abstract and job.nd.startswith("10.")
+    }
+    if missing:
+        exclude = {nd: job.rec.source for nd, job in missing.items()}
+        for nd, abstract in fetch_abstracts(list(missing), exclude=exclude).items():
+            missing[nd].rec.abstract = abstract
+    return jobs
+
+
+def _admit(item: tuple[tuple[str, ...], str, Record], scheduler: _Scheduler, opts: _Options) -> _Job | None:
+    job = scheduler.admit(item)
+    return _screen_abstract(job, opts) if job is not None else None
+
+
+def _match_xml(job: _Job, opts: _Options) -> tuple[bool | None, bool]:
+    """Fulltext patterns on the XML and whether it has the body.
+
+    Without the body (abstract-only responses) only a match decides; a miss
+    leaves the decision to the PDF.
+    """
+    xml_text, has_body = extract_xml_fulltext(config.XML_DIR / f"{doi_to_fname(job.rec_id)}.xml")
+    if not xml_text:
+        return None, False
+    if any(p.search(xml_text) for p in opts.fulltext_res):
+        return True, has_body
+    return (False if has_body else None), has_body
+
+
+def _download(job: _Job, opts: _Options) -> _Job:
+    """Fetch the XML first; the PDF is skipped when the XML body fails the fulltext
+    patterns (or, with ``prefer_xml``, whenever the XML has the body)."""
+    if job.finished:
+        return job
+    job.xml_ok = try_download_xml(job.rec_id, job.rec.xml_url)
+    if job.xml_ok and opts.probe_abstracts and job.abstract_matched is None:
+        _probe_abstract(job, opts, extract_xml_abstract(config.XML_DIR / f"{doi_to_fname(job.rec_id)}.xml"))
+        if job.finished:
+            job.direct_status = job.libgen_status = "not attempted (abstract filter not matched)"
+            return job
+    xml_usable = False  # the XML has the article body and can replace the PDF
+    if job.xml_ok and opts.fulltext_filter and opts.fulltext_res:
+        job.xml_decision, xml_usable = _match_xml(job, opts)
+        if job.xml_decision is False:
+            job.direct_status = job.libgen_status = "not attempted (XML failed the fulltext filter)"
+            _apply_fulltext_decision(job, opts, False)
+            job.finished = True
+            return job
+    elif job.xml_ok and opts.prefer_xml:
+        xml_usable = extract_xml_fulltext(config.XML_DIR / f"{doi_to_fname(job.rec_id)}.xml")[1]
+    if xml_usable and opts.prefer_xml:
+        job.direct_status = job.libgen_status = "not attempted (XML available)"
+        return job
+
+    pdf_result = try_download_pdf_with_validation(
+        job.rec_id,
+        job.title,
+        job.rec.pdf_url,
+        oa_only=opts.oa_only,
+        libgen_domain=opts.libgen_domain,
+    )
+    job.pdf_ok = pdf_result.success
+    job.direct_status = pdf_result.direct.message or "not attempted"
+    job.libgen_status = pdf_result.libgen.message or "not attempted"
+    if not job.pdf_ok and not job.xml_ok:
+        job.notes.append("download_failed")
+    return job
+
+
+def _filter_fulltext(job: _Job, opts: _Options) -> _Job:
+    try:
+        return _screen_fulltext(job, opts)
+    except ExtractionError as e:
+        # nothing was extracted: no negative result, the record is retried next run
+        print(f"{job.nd}: {e}; left out of the inventory", flush=True)
+        job.retry_later = True
+        return job
+
+
+def _screen_fulltext(job: _Job, opts: _Options) -> _Job:
+    if job.finished:
+        return job
+    if opts.probe_abstracts and job.abstract_matched is None and job.pdf_ok:
+        # the first pages only: rejected records skip the full extraction
+        head = probe_pdf(config.PDF_DIR / f"{doi_to_fname(job.rec_id)}.pdf")
+        _probe_abstract(job, opts, _extract_abstract_from_text(head))
+        if job.finished:
+            return job
+    # no extraction if fulltext_filter is False
+    if not opts.fulltext_filter:
+        return job
+    if job.xml_decision and not opts.save_text:
+        decision = True  # already matched in the XML
+    elif opts.save_text or not opts.fulltext_res or not config.FULLTEXT_EARLY_EXIT:
+        decision = _check_full_text(job, opts)
+    else:
+        decision = _scan_full_text(job, opts)
+    _apply_fulltext_decision(job, opts, decision)
+    return job
+
+
+def _check_full_text(job: _Job, opts: _Options) -> bool | None:
+    """Extract the complete text (saved when requested) and run the patterns over it."""
+    rec_id = job.rec_id
+    full_text = ""
+    if job.pdf_ok:
+        pdf_path = config.PDF_DIR / f"{doi_to_fname(rec_id)}.pdf"
+        text, tt = extract_pdf(pdf_path)
+        full_text += text
+        if tt:
+            full_text += "\n\n" + tt
+    if job.xml_ok:
+        xml_path = config.XML_DIR / f"{doi_to_fname(rec_id)}.xml"
+        full_text += "\n\n" + extract_text_from_xml(xml_path)
+
+    full_text = normalize_spaces(full_text.strip())
+    if not full_text:
+        return None
+    if opts.save_text:
+        text_path = config.TEXT_DIR / f"{doi_to_fname(rec_id)}.txt"
+        text_path.write_text(full_text, encoding="utf-8", errors="ignore")
+    if opts.fulltext_res:
+        return any(bool(p.search(full_text)) for p in opts.fulltext_res)
+    return True
+
+
+def _scan_full_text(job: _Job, opts: _Options) -> bool | None:
+    """Stop as soon as a pattern matches: XML text first, then PDF pages, then tables."""
+    decision: bool | None = None
+    if job.xml_ok:
+        xml_text = extract_text_from_xml(config.XML_DIR / f"{doi_to_fname(job.rec_id)}.xml")
+        if xml_text:
+            if any(p.search(xml_text) for p in opts.fulltext_res):
+                return True
+            decision = False
+    if job.pdf_ok:
+        pdf_decision = match_pdf(config.PDF_DIR / f"{doi_to_fname(job.rec_id)}.pdf", opts.fulltext_res)
+        if pdf_decision is not None:
+            decision = pdf_decision
+    return decision
+
+
+def _apply_fulltext_decision(job: _Job, opts: _Options, decision: bool | None) -> None:
+    if decision is None:
+        job.fulltext_matched = False
+        job.fulltext_message = "Fulltext filter: patterns not in text (no full text available)"
+    elif decision:
+        job.fulltext_matched = True
+        if opts.fulltext_res:
+            job.fulltext_message = "Fulltext filter: patterns matched in text"
+        else:
+            job.fulltext_message = "Fulltext filter: no patterns provided"
+    else:
+        job.fulltext_matched = False
+        job.notes.append("skip:fulltext_filter")
+        job.fulltext_message = "Fulltext filter: patterns not in text (article removed)"
+        _remove_files(job, opts)
+
+
+def _remove_files(job: _Job, opts: _Options) -> None:
+    """Delete the downloaded files (and saved text) of a rejected record."""
+    rec_id = job.rec_id
+    for path in [
+        config.PDF_DIR / f"{doi_to_fname(rec_id)}.pdf",
+        config.XML_DIR / f"{doi_to_fname(rec_id)}.xml",
+    ]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    if opts.save_text:
+        try:
+            (config.TEXT_DIR / f"{doi_to_fname(rec_id)}.txt").unlink()
+        except FileNotFoundError:
+            pass
+    job.pdf_ok = False
+    job.xml_ok = False
+
+
+def _probe_abstract(job: _Job, opts: _Options, abstract: str) -> None:
+    """Apply the abstract filter to an abstract read from the downloaded full text."""
+    if not abstract:
+        return
+    job.abstract = abstract
+    job.notes = [n for n in job.notes if n != "abstract_not_found"] + ["abstract_from_fulltext"]
+    if any(p.search(f"{job.title}\n{abstract}") for p in opts.abstract_res):
+        job.abstract_matched = True
+        job.report_lines.append("  Abstract filter: patterns in abstract (read from the full text)")
+        return
+    job.abstract_matched = False
+    job.notes.append("skip:abstract_filter")
+    job.report_lines.append("  Abstract filter: patterns not in abstract (read from the full text, article removed)")
+    if opts.fulltext_filter:
+        job.fulltext_matched = False
+        job.fulltext_message = "Fulltext filter: not run (abstract filter not matched)"
+    _remove_files(job, opts)
+    job.finished = True
+
+
+def _record_result(job: _Job, opts: _Options) -> None:
+    logwriter.write_row(job.row())
+    if opts.verbose:
+        job.report_lines.append(f"  Direct download: {job.direct_status}")
+        job.report_lines.append(f"  Libgen download: {job.libgen_status}")
+        if job.fulltext_message:
+            job.report_lines.append(f"  Fulltext filter: {job.fulltext_message}")
+        print("\n".join(job.report_lines), flush=True)
+        print(flush=True)
+
+
 def run_pipeline(
     keywords: list[str],
     abstract_filter: bool = False,
@@ -96,203 +612,191 @@ def run_pipeline(
     libgen_domain: str | None = "bz",
     verbose: bool = True,
     save_text: bool = True,
+    download_workers: int | None = None,
+    combine_keywords: bool = False,
+    require_abstract: bool = False,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    sharded: bool = False,
+    prefer_xml: bool = False,
+    probe_abstracts: bool = False,
 ): 
-    """Execute full pipeline of search, download and filtering."""
+    """Execute full pipeline of search, download and filtering.
+
+    Search results stream page by page through bounded queues into the screening,
+    download and full-text stages, so downloads start while sources are still paged.
+    ``download_workers`` (default ``config.DOWNLOAD_WORKERS``) records are downloaded
+    at once, within the per-host limits of ``config.HOST_CONCURRENCY``.
+
+    With ``combine_keywords`` OpenAlex, EuropePMC and arXiv get one OR query for all
+    keywords instead of one query per keyword (``max_per_source`` then applies to that
+    query). Records found for several keywords are downloaded once and list all of
+    them in the inventory ``keyword`` column.
+
+    Restrictions are sent to the APIs as native filters where supported: ``oa_only``
+    (open access, EuropePMC also with a PDF), ``require_abstract`` and the publication
+    date range ``from_date``/``to_date`` (``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD``).
+    Search responses are limited to the fields the parsers read; EuropePMC returns
+    its compact ``lite`` results (no abstracts) unless abstracts are needed for the
+    abstract filter or for combined keywords.
+
+    With ``sharded`` OpenAlex, Crossref and EuropePMC queries with more than
+    ``config.SHARD_TARGET`` hits are split into publication-year ranges that are paged
+    concurrently (``config.SHARD_WORKERS`` per source). Results then no longer come
+    in the API's overall relevance order.
+
+    With ``abstract_filter``, records that come without an abstract are batched and
+    their abstracts looked up by DOI in OpenAlex, EuropePMC and Crossref (cached)
+    before the filter runs. With ``probe_abstracts``, records still without one are
+    filtered on the abstract of the downloaded XML, or of the first
+    ``config.ABSTRACT_PROBE_PAGES`` PDF pages, before any full-text extraction.
+
+    Records with an XML link get it first: with ``fulltext_filter`` the patterns run
+    on the XML and the PDF is not downloaded when the XML body does not match them
+    (abstract-only XMLs leave a miss to the PDF). With ``prefer_xml`` the PDF is not
+    downloaded at all when the XML has the body.
+
+    Search cursors and records not yet in the inventory are checkpointed to
+    ``checkpoint.json`` in the output directory; a rerun after a crash or Ctrl+C
+    resumes from there. The checkpoint is removed once a run completes.
+    """
 
     if not keywords:
         raise ValueError("'keywords' must not be empty")
+    filters = SearchFilters(
+        open_access=oa_only,
+        has_abstract=require_abstract,
+        has_pdf=oa_only,  # only direct links are tried for oa_only
+        from_date=from_date,
+        to_date=to_date,
+    )
 
-    abstract_res = [re.compile(p) for p in (abstract_regex or [])]
-    fulltext_res = [re.compile(p) for p in (fulltext_regex or [])] if fulltext_filter else []
+    opts = _Options(
+        abstract_filter=abstract_filter,
+        abstract_res=[re.compile(p) for p in (abstract_regex or [])],
+        fulltext_filter=fulltext_filter,
+        fulltext_res=[re.compile(p) for p in (fulltext_regex or [])] if fulltext_filter else [],
+        oa_only=oa_only,
+        libgen_domain=libgen_domain,
+        verbose=verbose,
+        save_text=save_text,
+        prefer_xml=prefer_xml,
+        probe_abstracts=probe_abstracts and abstract_filter,
+    )
 
     # Configure paths and inventory
     config.set_output_dir(output_directory)
     ensure_dirs()
+    if fulltext_filter or opts.probe_abstracts:
+        start_pool()  # fork extraction workers before any thread or SQLite connection exists
     ensure_inventory_file()
+    logwriter.start()
 
     max_records = max_per_source if max_per_source is not None else 1_000_000
 
     # --- search by sources ---
     src_funcs = {
-        "openalex": search_openalex,
-        "europepmc": search_europe_pmc,
-        "crossref": search_crossref,
-        "arxiv": search_arxiv,
-        "sciencedirect": search_sciencedirect,
+        "openalex": iter_openalex,
+        "europepmc": iter_europe_pmc,
+        "crossref": iter_crossref,
+        "arxiv": iter_arxiv,
+        "sciencedirect": iter_sciencedirect,
     }
     selected = [s.lower() for s in (sources or src_funcs.keys()) if s.lower() in src_funcs]
 
-    seen = load_seen_inventory()
-
-    for kw in keywords:
-        print(f"\n=== Keyword: {kw} ===", flush=True)
-        config.set_keywords([kw])
-        searches = [src_funcs[s]([kw], max_records) for s in selected]
-        db = _merge_sources(*searches)
-        print(f"Total unique records for '{kw}': {len(db)}", flush=True)
-
-        for rec_id, rec in db.items():
-            nd = norm_doi(rec_id) or rec_id
-            if nd in seen:
-                continue
-
-            title = (rec.get("title") or "").replace("\n", " ").replace("\r", " ")
-            abstr = rec.get("abstract") or ""
-            abstract_available = bool(abstr)
-
-            notes: list[str] = []
-            fulltext_matched = None
-            pdf_ok = False
-            xml_ok = False
-
-            report_lines = [
-                f"- DOI: {nd}",
-                f"  Source: {rec.get('source', '') or 'unknown'}",
-            ]
-
-            abstract_matched: bool | None = True
-            abstract_status = None
-            if abstract_filter:
-                combined_text = f"{title}\n{abstr}" if abstract_available else ""
-                if abstract_available:
-                    if any(p.search(combined_text) for p in abstract_res):
-                        abstract_status = "patterns in abstract"
-                        abstract_matched = True
-                    else:
-                        abstract_matched = False
-                        abstract_status = "patterns not in abstract"
-                        notes.append("skip:abstract_filter")
-                else:
-                    abstract_matched = None
-                    abstract_status = "abstract not found"
-                    notes.append("abstract_not_found")
-                report_lines.append(f"  Abstract filter: {abstract_status}")
-
-            direct_status: str | None = None
-            libgen_status: str | None = None
-            fulltext_message: str | None = None
-
-            if abstract_filter and abstract_matched is False:
-                direct_status = (
-                    "not attempted (abstract filter not matched)"
-                    if rec.get("pdf_url")
-                    else "no direct link provided"
-                )
-                libgen_status = "not attempted (abstract filter not matched)"
-                if fulltext_filter:
-                    fulltext_message = "Fulltext filter: not run (abstract filter not matched)"
-                row = {
-                    "doi": nd,
-                    "title": title,
-                    "source": rec.get("source", ""),
-                    "keyword": kw,
-                    "abstract_available": abstract_available,
-                    "abstract_matched": False,
-                    "pdf_downloaded": False,
-                    "xml_downloaded": False,
-                    "fulltext_matched": False if fulltext_filter else None,
-                    "notes": ",".join(notes),
-                }
-                append_inventory_row(row)
-                seen.add(nd)
-                if verbose:
-                    report_lines.append(f"  Direct download: {direct_status}")
-                    report_lines.append(f"  Libgen download: {libgen_status}")
-                    if fulltext_message:
-                        report_lines.append(f"  Fulltext filter: {fulltext_message}")
-                    print("\n".join(report_lines), flush=True)
-                    print(flush=True)
+    print(f"\n=== Keywords: {', '.join(keywords)} ===", flush=True)
+    config.set_keywords(keywords)
+    checkpoint = Checkpoint.load(filters=filters.signature())
+    if checkpoint.resumed:
+        print(
+            f"Resuming from {checkpoint.path} ({len(checkpoint.inflight)} records in flight)",
+            flush=True,
+        )
+    scheduler = _Scheduler(load_seen_inventory(), checkpoint)
+
+    stop = threading.Event()
+    producers = {}
+    if checkpoint.inflight:
+        producers["resume"] = checkpoint.pending_records()
+    for i, name in enumerate(selected):
+        groups = keyword_groups(keywords, combine_keywords and name in _COMBINABLE_SOURCES)
+        options = {"filters": filters} if filters.active else {}
+        if name == "europepmc" and not (abstract_filter or combine_keywords):
+            options["abstracts"] = False  # abstracts unused: request the lite result type
+        producers[name] = _iter_keywords(
+            src_funcs[name],
+            groups,
+            max_records,
+            i,
+            name,
+            checkpoint,
+            stop,
+            options,
+            sharded=sharded and name in _SHARDABLE_SOURCES,
+        )
+        # create every progress entry up front: search threads only mutate existing dicts
+        for label, _ in groups:
+            checkpoint.progress(name, label)
+    previous_sigint = _install_sigint(stop)
+
+    found, screened, downloaded, filtered = (make_queue() for _ in range(4))
+    Producer(producers, found).start()
+    if abstract_filter:
+        # records without an abstract get it looked up in bulk before they are screened
+        admitted, enriched = make_queue(), make_queue()
+        Stage("admit", scheduler.admit, found, admitted).start()
+        BatchStage(
+            "enrich",
+            _enrich_abstracts,
+            admitted,
+            enriched,
+            size=config.ENRICH_BATCH_SIZE,
+            wait=config.ENRICH_BATCH_WAIT,
+        ).start()
+        Stage("screen", partial(_screen_abstract, opts=opts), enriched, screened).start()
+    else:
+        Stage("screen", partial(_admit, scheduler=scheduler, opts=opts), found, screened).start()
+    Stage(
+        "download",
+        partial(_download, opts=opts),
+        screened,
+        downloaded,
+        workers=download_workers or config.DOWNLOAD_WORKERS,
+    ).start()
+    Stage(
+        "fulltext",
+        partial(_filter_fulltext, opts=opts),
+        downloaded,
+        filtered,
+        workers=max(1, config.EXTRACT_WORKERS),
+    ).start()
+
+    try:
+        for job in iter_queue(filtered):
+            if job.retry_later:
+                scheduler.drop(job)  # stays in the checkpoint if this run is interrupted
                 continue
+            scheduler.release(job)
+            _record_result(job, opts)
+            checkpoint.remove_inflight(job.nd)
+            checkpoint.maybe_save()
+    finally:
+        checkpoint.save()
+        shutdown_pool()  # stop the extraction workers instead of leaving them to interpreter exit
+        if previous_sigint is not None:
+            signal.signal(signal.SIGINT, previous_sigint)
 
-            pdf_result = try_download_pdf_with_validation(
-                rec_id,
-                title,
-                rec.get("pdf_url"),
-                oa_only=oa_only,
-                libgen_domain=libgen_domain,
-            )
-            pdf_ok = pdf_result.success
-            direct_status = pdf_result.direct.message or "not attempted"
-            libgen_status = pdf_result.libgen.message or "not attempted"
-
-            xml_ok = try_download_xml(rec_id, rec.get("xml_url"))
-            if not pdf_ok and not xml_ok:
-                notes.append("download_failed")
-
-            if fulltext_filter:
-                full_text = ""
-                text_path = config.TEXT_DIR / f"{doi_to_fname(rec_id)}.txt"
-                if pdf_ok:
-                    pdf_path = config.PDF_DIR / f"{doi_to_fname(rec_id)}.pdf"
-                    full_text += extract_text_from_pdf(pdf_path)
-                    tt = extract_tables_text(pdf_path)
-                    if tt:
-                        full_text += "\n\n" + tt
-                if xml_ok:
-                    xml_path = config.XML_DIR / f"{doi_to_fname(rec_id)}.xml"
-                    full_text += "\n\n" + extract_text_from_xml(xml_path)
-
-                full_text = normalize_spaces(full_text.strip())
-                if full_text:
-                    if fulltext_res:
-                        filter_pass = any(bool(p.search(full_text)) for p in fulltext_res)
-                    else:
-                        filter_pass = True
-                    if save_text:
-                        text_path.write_text(full_text, encoding="utf-8", errors="ignore")
-                    if filter_pass:
-                        fulltext_matched = True
-                        if fulltext_res:
-                            fulltext_message = "Fulltext filter: patterns matched in text"
-                        else:
-                            fulltext_message = "Fulltext filter: no patterns provided"
-                    else:
-                        fulltext_matched = False
-                        notes.append("skip:fulltext_filter")
-                        fulltext_message = "Fulltext filter: patterns not in text (article removed)"
-                        for path in [
-                            config.PDF_DIR / f"{doi_to_fname(rec_id)}.pdf",
-                            config.XML_DIR / f"{doi_to_fname(rec_id)}.xml",
-                        ]:
-                            try:
-                                path.unlink()
-                            except FileNotFoundError:
-                                pass
-                        if save_text:
-                            try:
-                                text_path.unlink()
-                            except FileNotFoundError:
-                                pass
-                        pdf_ok = False
-                        xml_ok = False
-                else:
-                    fulltext_matched = False
-                    fulltext_message = "Fulltext filter: patterns not in text (no full text available)"
-            # no extraction if fulltext_filter is False
-
-            if verbose:
-                report_lines.append(f"  Direct download: {direct_status}")
-                report_lines.append(f"  Libgen download: {libgen_status}")
-                if fulltext_message:
-                    report_lines.append(f"  Fulltext filter: {fulltext_message}")
-
-            row = {
-                "doi": nd,
-                "title": title,
-                "source": rec.get("source", ""),
-                "keyword": kw,
-                "abstract_available": abstract_available,
-                "abstract_matched": abstract_matched,
-                "pdf_downloaded": pdf_ok,
-                "xml_downloaded": xml_ok,
-                "fulltext_matched": fulltext_matched,
-                "notes": ",".join(notes) if notes else "",
-            }
-            append_inventory_row(row)
-            seen.add(nd)
-            if verbose:
-                print("\n".join(report_lines), flush=True)
-                print(flush=True)
+    for kw in keywords:
+        print(f"Total unique records for '{kw}': {len(scheduler.totals.get(kw, ()))}", flush=True)
+    for line in resilience.report():
+        print(f"HTTP {line}", flush=True)
+    logwriter.flush()
+    update_inventory_keywords(scheduler.keyword_updates())
+    export_inventory_csv()
+    if stop.is_set():
+        print(f"Stopped early. Run again with the same arguments to resume ({checkpoint.path}).", flush=True)
+        return
+    checkpoint.discard()
     if verbose:
         print(f"Done. Summary in {config.LOG_INVENTORY}", flush=True)
 
@@ -304,7 +808,12 @@ def try_failed(
     fulltext_regex: list[str] | None = None,
     libgen_domain: str | None = "bz",
 ) -> None:
-    """Retry LibGen downloads for inventory rows marked as ``download_failed``."""
+    """Retry LibGen downloads for inventory rows marked as ``download_failed``.
+
+    ``inventory_path`` is the ``inventory.csv`` export or the ``inventory.sqlite``
+    database of an output directory; rows are updated in place in the database and
+    the CSV export is refreshed afterwards.
+    """
 
     path = Path(inventory_path)
     if not path.exists():
@@ -332,72 +841,80 @@ def try_failed(
     output_dir = path.parent
     config.set_output_dir(output_dir)
     ensure_dirs()
+    if path.suffix == ".sqlite":
+        config.LOG_INVENTORY_DB = path
+    else:
+        config.LOG_INVENTORY = path
+    ensure_inventory_file()
 
     domain = libgen_domain or "bz"
     fulltext_res = [re.compile(p) for p in (fulltext_regex or [])] if fulltext_filter else []
 
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        if not fieldnames:
-            return
+    # only rows whose status is download_failed are read (indexed lookup)
+    failed_rows = list(iter_inventory_rows(status="download_failed"))
+    retried = 0
+    for index, row in enumerate(failed_rows, start=1):
+        row_id = row.pop("id")
+        doi = row.get("doi")
+        title = (row.get("title") or "").replace("\n", " ").strip()
+        label = doi or title or f"row #{index}"
+        print(
+            f"[{index}] Processing entry: {label}",
+            flush=True,
+        )
+
+        notes_raw = row.get("notes", "") or ""
+        notes = [n.strip() for n in notes_raw.split(",") if n.strip()]
 
-        rows: list[dict[str, str]] = []
-        for index, row in enumerate(reader, start=1):
-            doi = row.get("doi")
-            title = (row.get("title") or "").replace("\n", " ").strip()
-            label = doi or title or f"row #{index}"
+        if not doi:
             print(
-                f"[{index}] Processing entry: {label}",
+                f"[{index}] Skipping (missing DOI for failed download entry).",
                 flush=True,
             )
+            continue
 
-            notes_raw = row.get("notes", "") or ""
-            notes = [n.strip() for n in notes_raw.split(",") if n.strip()]
-            if "download_failed" not in notes:
-                print(
-                    f"[{index}] Skipping (no 'download_failed' note present).",
-                    flush=True,
-                )
-                rows.append(row)
-                continue
-
-            if not doi:
-                print(
-                    f"[{index}] Skipping (missing DOI for failed download entry).",
-                    flush=True,
-                )
-                rows.append(row)
-                continue
-
-            pdf_path = config.PDF_DIR / f"{doi_to_fname(doi)}.pdf"
-            pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        pdf_path = config.PDF_DIR / f"{doi_to_fname(doi)}.pdf"
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
 
+        print(
+            f"[{index}] Attempting LibGen download to {pdf_path}...",
+            flush=True,
+        )
+        success, _ = download_via_libgen_stub(str(doi), pdf_path, domain)
+        if not success or not is_valid_pdf(pdf_path):
+            delete_if_exists(pdf_path)
             print(
-                f"[{index}] Attempting LibGen download to {pdf_path}...",
+                f"[{index}] Download failed or produced invalid PDF.",
                 flush=True,
             )
-            success, _ = download_via_libgen_stub(str(doi), pdf_path, domain)
-            if not success or not is_valid_pdf(pdf_path):
-                delete_if_exists(pdf_path)
-                print(
-                    f"[{index}] Download failed or produced invalid PDF.",
-                    flush=True,
-                )
-                rows.append(row)
-                continue
+            continue
 
-            keep_pdf = True
-            status_note = "downloaded after retry"
+        keep_pdf = True
+        status_note = "downloaded after retry"
 
-            print(
-                f"[{index}] Download succeeded. Validating fulltext filter...",
-                flush=True,
-            )
+        print(
+            f"[{index}] Download succeeded. Validating fulltext filter...",
+            flush=True,
+        )
 
-            if fulltext_filter:
-                full_text = extract_text_from_pdf(pdf_path)
-                tables_text = extract_tables_text(pdf_path)
+        if fulltext_filter:
+            early_exit = bool(fulltext_res) and config.FULLTEXT_EARLY_EXIT
+            try:
+                if early_exit:
+                    decision = match_pdf(pdf_path, fulltext_res)
+                else:
+                    full_text, tables_text = extract_pdf(pdf_path)
+            except ExtractionError as e:
+                print(f"[{index}] {e}; entry left unchanged.", flush=True)
+                continue
+            if early_exit:
+                filter_pass = bool(decision)
+                print(
+                    f"[{index}] "
+                    + ("Fulltext not available for filtering." if decision is None else "Fulltext scanned."),
+                    flush=True,
+                )
+            else:
                 if tables_text:
                     full_text = f"{full_text}\n\n{tables_text}" if full_text else tables_text
                 full_text = normalize_spaces(full_text.strip())
@@ -418,59 +935,58 @@ def try_failed(
                         flush=True,
                     )
 
-                if filter_pass:
-                    row["fulltext_matched"] = "True"
-                    print(
-                        f"[{index}] Fulltext filter result: PASSED.",
-                        flush=True,
-                    )
-                else:
-                    row["fulltext_matched"] = "False"
-                    status_note = "skip:fulltext_filter"
-                    keep_pdf = False
-                    print(
-                        f"[{index}] Fulltext filter result: FAILED (PDF will be removed).",
-                        flush=True,
-                    )
-
-            if keep_pdf:
-                append_line(config.LOG_PDF_DOI, str(doi))
-                row["pdf_downloaded"] = "True"
+            if filter_pass:
+                row["fulltext_matched"] = "True"
                 print(
-                    f"[{index}] PDF retained and marked as downloaded.",
+                    f"[{index}] Fulltext filter result: PASSED.",
                     flush=True,
                 )
             else:
-                delete_if_exists(pdf_path)
-                row["pdf_downloaded"] = "False"
+                row["fulltext_matched"] = "False"
+                status_note = "skip:fulltext_filter"
+                keep_pdf = False
                 print(
-                    f"[{index}] PDF removed and marked as not downloaded.",
+                    f"[{index}] Fulltext filter result: FAILED (PDF will be removed).",
                     flush=True,
                 )
 
-            notes = [n for n in notes if n != "download_failed"]
-            if status_note == "downloaded after retry":
-                notes = [n for n in notes if n != "skip:fulltext_filter"]
-            if status_note and status_note not in notes:
-                notes.append(status_note)
-            row["notes"] = ",".join(notes)
-
+        if keep_pdf:
+            append_line(config.LOG_PDF_DOI, str(doi))
+            row["pdf_downloaded"] = "True"
             print(
-                f"[{index}] Updated notes: {row['notes'] or '—'}",
+                f"[{index}] PDF retained and marked as downloaded.",
+                flush=True,
+            )
+        else:
+            delete_if_exists(pdf_path)
+            row["pdf_downloaded"] = "False"
+            print(
+                f"[{index}] PDF removed and marked as not downloaded.",
                 flush=True,
             )
 
-            rows.append(row)
+        notes = [n for n in notes if n != "download_failed"]
+        if status_note == "downloaded after retry":
+            notes = [n for n in notes if n != "skip:fulltext_filter"]
+        if status_note and status_note not in notes:
+            notes.append(status_note)
+        row["notes"] = ",".join(notes)
 
         print(
-            f"Processed {len(rows)} inventory entries. Writing updates...",
+            f"[{index}] Updated notes: {row['notes'] or '—'}",
             flush=True,
         )
 
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+        update_inventory_row(row_id, row)
+        retried += 1
+
+    print(
+        f"Processed {len(failed_rows)} failed inventory entries ({retried} updated). "
+        f"Exporting {config.LOG_INVENTORY}...",
+        flush=True,
+    )
+    logwriter.flush()
+    export_inventory_csv()
 
     print("Retry process completed. Inventory file updated.", flush=True)
 
@@ -490,8 +1006,7 @@ def run_local(
 
     fulltext_res = [re.compile(p) for p in (fulltext_regex or [])] if fulltext_filter else []
 
-    full_text = extract_text_from_pdf(pdf_path)
-    tables_text = extract_tables_text(pdf_path)
+    full_text, tables_text = extract_pdf(pdf_path)
     if tables_text:
         full_text += "\n\n" + tables_text
     full_text = normalize_spaces(full_text.strip())
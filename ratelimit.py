@@ -0,0 +1,163 @@
+"""Per-host token-bucket rate limiting shared by every thread of the process."""
+from __future__ import annotations
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import config
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(self.updated, now)
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def block(self, seconds: float) -> None:
+        """Hold all requests for ``seconds`` and restart refilling from an empty bucket."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self.blocked_until:
+                self.blocked_until = until
+                self.tokens = 0.0
+                self.updated = until
+
+    def throttle(self, rate: float) -> None:
+        """Lower the refill rate (never raises it above the configured value)."""
+        with self._lock:
+            if 0 < rate < self.rate:
+                self.rate = rate
+                self.capacity = min(self.capacity, max(rate, 1.0))
+
+
+_lock = threading.Lock()
+_buckets: dict[str, TokenBucket] = {}
+
+
+def _limit_key(url: str) -> str:
+    """Return the most specific ``config.RATE_LIMITS`` key matching ``url`` (host when none)."""
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    target = host + (parsed.path or "")
+    best = None
+    for key in config.RATE_LIMITS:
+        if target.startswith(key) and (best is None or len(key) > len(best)):
+            best = key
+    return best or host
+
+
+def bucket_for(url: str) -> TokenBucket:
+    key = _limit_key(url)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                rate, burst = config.RATE_LIMITS.get(key, (1.0 / config.RATE_LIMIT_SLEEP, 1))
+                bucket = TokenBucket(rate, burst)
+                _buckets[key] = bucket
+    return bucket
+
+
+def acquire(url: str) -> None:
+    """Wait for the rate limit of the host serving ``url``."""
+    bucket_for(url).acquire()
+
+
+def block(url: str, seconds: float) -> None:
+    """Pause every request to the host serving ``url`` for ``seconds``."""
+    bucket_for(url).block(seconds)
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _parse_interval(value: str | None) -> float | None:
+    """Parse Crossref-style intervals such as ``1s`` or ``60s``."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    scale = 1.0
+    if value.endswith("ms"):
+        value, scale = value[:-2], 0.001
+    elif value.endswith("s"):
+        value = value[:-1]
+    elif value.endswith("m"):
+        value, scale = value[:-1], 60.0
+    try:
+        return float(value) * scale
+    except ValueError:
+        return None
+
+
+def observe(url: str, response) -> None:
+    """Adapt the host bucket to ``Retry-After`` and ``X-RateLimit-*`` response headers."""
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return
+    bucket = bucket_for(url)
+
+    status = getattr(response, "status_code", 200)
+    if status in (429, 503):
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        bucket.block(retry_after if retry_after is not None else config.RATE_LIMIT_BACKOFF)
+
+    remaining = headers.get("X-RateLimit-Remaining")
+    reset = headers.get("X-RateLimit-Reset")
+    if remaining is not None and reset is not None:
+        try:
+            if int(float(remaining)) <= 0:
+                reset_value = float(reset)
+                # epoch seconds (Elsevier) or seconds until reset
+                wait = reset_value - time.time() if reset_value > 1e9 else reset_value
+                bucket.block(wait)
+        except ValueError:
+            pass
+
+    limit = headers.get("X-Rate-Limit-Limit") or headers.get("X-RateLimit-Limit")
+    interval = _parse_interval(headers.get("X-Rate-Limit-Interval"))
+    if limit and interval:
+        try:
+            bucket.throttle(float(limit) / interval)
+        except (ValueError, ZeroDivisionError):
+            pass
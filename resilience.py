@@ -0,0 +1,195 @@
+"""Retries with jittered backoff and per-host circuit breakers for ``http_client``.
+
+Timeouts, connection errors, 429 and 5xx responses are retried; other 4xx responses
+are returned at once. A host that keeps failing gets its circuit opened for
+``config.CIRCUIT_RESET`` seconds, during which requests to it fail immediately with
+``CircuitOpenError``. Request, retry and latency counts are kept per source.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from urllib.parse import urlparse
+import random
+import threading
+import time
+
+import requests
+
+import config
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# hosts of the search and download APIs -> source name used in the statistics
+_SOURCES = {
+    "api.openalex.org": "openalex",
+    "api.crossref.org": "crossref",
+    "www.ebi.ac.uk": "europepmc",
+    "europepmc.org": "europepmc",
+    "export.arxiv.org": "arxiv",
+    "arxiv.org": "arxiv",
+    "api.elsevier.com": "sciencedirect",
+    "api.unpaywall.org": "unpaywall",
+}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+
+@dataclass
+class SourceStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0  # requests that failed after the last attempt
+    rejected: int = 0  # requests refused by an open circuit
+    latency: float = 0.0  # seconds spent in attempts, summed
+
+    @property
+    def mean_latency(self) -> float:
+        attempts = self.requests - self.rejected + self.retries
+        return self.latency / attempts if attempts else 0.0
+
+
+class CircuitBreaker:
+    """Closed until ``config.CIRCUIT_FAILURES`` consecutive failures, then open for
+    ``config.CIRCUIT_RESET`` seconds; after that a single trial request decides."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < config.CIRCUIT_RESET or self.trial:
+                return False
+            self.trial = True  # half open: let one request through
+            return True
+
+    def release(self) -> None:
+        """End a trial request that neither succeeded nor failed."""
+        with self._lock:
+            self.trial = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self.trial = 0, None, False
+
+    def failure(self) -> bool:
+        """Count a failure; return whether the circuit opened because of it."""
+        with self._lock:
+            self.failures += 1
+            reopened = self.trial
+            self.trial = False
+            if reopened or (self.opened_at is None and self.failures >= config.CIRCUIT_FAILURES):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+_lock = threading.Lock()
+_breakers: dict[str, CircuitBreaker] = {}
+_stats: dict[str, SourceStats] = {}
+
+
+def _host(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def source_of(url: str) -> str:
+    host = _host(url)
+    return _SOURCES.get(host, host)
+
+
+def _breaker(host: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def _count(url: str, **deltas) -> None:
+    with _lock:
+        stats = _stats.setdefault(source_of(url), SourceStats())
+        for name, value in deltas.items():
+            setattr(stats, name, getattr(stats, name) + value)
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * 2**attempt))
+
+
+def call(url: str, send, wait=None):
+    """Run ``send()`` (one GET of ``url``) with retries and the host's circuit breaker.
+
+    ``wait()`` runs before every attempt, outside the latency measurement (rate limits).
+    Returns the last response, which may carry an error status; re-raises the last
+    network error when every attempt failed.
+    """
+    host = _host(url)
+    breaker = _breaker(host)
+    if not breaker.allow():
+        _count(url, requests=1, rejected=1)
+        raise CircuitOpenError(f"circuit open for {host} after repeated failures")
+    _count(url, requests=1)
+    attempt = 0
+    while True:
+        if wait is not None:
+            wait()
+        started = time.monotonic()
+        error = response = None
+        try:
+            response = send()
+        except (requests.Timeout, requests.ConnectionError) as e:
+            error = e
+        except Exception:
+            breaker.release()
+            raise
+        _count(url, latency=time.monotonic() - started)
+        status = getattr(response, "status_code", None)
+        if error is None and status not in RETRY_STATUSES:
+            breaker.success()  # the host answered, even if with a client error
+            return response
+        # a 429 means "slow down" (ratelimit already paused the host), not "host down"
+        if status != 429 and breaker.failure():
+            print(f"{host} keeps failing: pausing requests for {config.CIRCUIT_RESET:.0f} s", flush=True)
+        if attempt >= config.HTTP_RETRIES or not breaker.allow():
+            _count(url, failures=1)
+            if error is not None:
+                raise error
+            return response
+        if response is not None:
+            response.close()
+        time.sleep(backoff(attempt))
+        attempt += 1
+        _count(url, retries=1)
+
+
+def stats() -> dict[str, SourceStats]:
+    """Copy of the request statistics per source."""
+    with _lock:
+        return {name: SourceStats(**{f.name: getattr(s, f.name) for f in fields(s)}) for name, s in _stats.items()}
+
+
+def report() -> list[str]:
+    """One line per source that had retries, failures or rejected requests."""
+    lines = []
+    for name, s in sorted(stats().items()):
+        if s.retries or s.failures or s.rejected:
+            lines.append(
+                f"{name}: {s.requests} requests, {s.retries} retries, {s.failures} failed, "
+                f"{s.rejected} rejected (circuit open), {s.mean_latency * 1000:.0f} ms mean latency"
+            )
+    return lines
+
+
+def reset() -> None:
+    """Forget statistics and circuit states."""
+    with _lock:
+        _breakers.clear()
+        _stats.clear()
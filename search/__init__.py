@@ -1,6 +1,8 @@
-from search.openalex import search_openalex
-from search.europepmc import search_europe_pmc
-from search.crossref import search_crossref
-from search.arxiv import search_arxiv
-from search.sciencedirect import search_sciencedirect
-
+from search.record import Record
+from search.filters import SearchFilters
+from search.openalex import search_openalex, iter_openalex, year_counts_openalex
+from search.europepmc import search_europe_pmc, iter_europe_pmc, count_europe_pmc
+from search.crossref import search_crossref, iter_crossref, year_counts_crossref
+from search.arxiv import search_arxiv, iter_arxiv
+from search.sciencedirect import search_sciencedirect, iter_sciencedirect
+from search.abstracts import fetch_abstracts
@@ -0,0 +1,75 @@
+"""Bulk lookup of missing abstracts by DOI, for records whose source returned none."""
+from __future__ import annotations
+
+import config
+import http_cache
+from search.crossref import abstracts_crossref
+from search.europepmc import abstracts_europe_pmc
+from search.openalex import abstracts_openalex
+
+# tried in this order, each for the DOIs still missing
+PROVIDERS = [
+    ("openalex", abstracts_openalex),
+    ("europepmc", abstracts_europe_pmc),
+    ("crossref", abstracts_crossref),
+]
+
+
+def _cache_key(doi: str) -> str:
+    return f"abstract:{doi}"  # kept next to the API responses in http_cache
+
+
+def _cached(doi: str) -> str | None:
+    """Cached abstract of ``doi``: text, ``""`` when known to be missing, ``None`` if unknown."""
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+    entry = http_cache.get(_cache_key(doi))
+    if entry is None or not entry.fresh:
+        return None
+    return entry.body.decode("utf-8")
+
+
+def _store(doi: str, abstract: str) -> None:
+    if config.HTTP_CACHE_ENABLED:
+        ttl = config.ABSTRACT_CACHE_TTL if abstract else config.ABSTRACT_CACHE_MISS_TTL
+        http_cache.put(_cache_key(doi), abstract.encode("utf-8"), {}, ttl)
+
+
+def fetch_abstracts(dois: list[str], exclude: dict[str, str] | None = None) -> dict[str, str]:
+    """Abstracts found for ``dois`` (normalized), looked up in bulk per provider.
+
+    ``exclude`` maps a DOI to the source whose record already lacked the abstract;
+    that provider is not asked again. Abstracts are cached; a miss only once every
+    provider asked for the DOI answered, so an outage is not remembered as a miss.
+    """
+    exclude = exclude or {}
+    found: dict[str, str] = {}
+    missing = []
+    for doi in dict.fromkeys(dois):
+        cached = _cached(doi)
+        if cached is None:
+            missing.append(doi)
+        elif cached:
+            found[doi] = cached
+    remaining = set(missing)
+    unanswered: set[str] = set()  # a provider failed for these: not known to be missing
+    for name, lookup in PROVIDERS:
+        batch = [doi for doi in missing if doi in remaining and exclude.get(doi) != name]
+        if not batch:
+            continue
+        try:
+            results = lookup(batch)
+        except Exception as e:
+            print(f"Abstract lookup in {name} failed: {e}", flush=True)
+            results = {}
+        for doi in batch:
+            abstract = results.get(doi)
+            if abstract is None:
+                unanswered.add(doi)
+            elif abstract:
+                found[doi] = abstract
+                remaining.discard(doi)
+    for doi in missing:
+        if doi in found or doi not in unanswered:
+            _store(doi, found.get(doi, ""))
+    return found
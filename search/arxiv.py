@@ -1,12 +1,17 @@
+from itertools import chain
 import math
 from xml.etree import ElementTree as ET
 from urllib.parse import urlencode
 from tqdm import tqdm
-from utils import safe_get, norm_doi
+from utils import safe_get, norm_doi, search_progress, keyword_groups
+from search.filters import SearchFilters
+from search.record import Record
+from search.shards import prefetch_pages
 
 NS = {
     "atom": "http://www.w3.org/2005/Atom",
     "arxiv": "http://arxiv.org/schemas/atom",
+    "opensearch": "http://a9.com/-/spec/opensearch/1.1/",
 }
 
 def _parse_entry(entry_el):
@@ -23,51 +28,111 @@ def _parse_entry(entry_el):
     rec_id = doi or (f"arxiv:{arxiv_id}" if arxiv_id else None)
     if not rec_id:
         return None
-    return rec_id, {
-        "source": "arxiv",
-        "title": title,
-        "abstract": abstract,
-        "pdf_url": pdf_url,
-        "xml_url": None,
-        "raw": {"arxiv_id": arxiv_id, "doi": doi},
-    }
+    return rec_id, Record(
+        source="arxiv",
+        title=title,
+        abstract=abstract,
+        pdf_url=pdf_url,
+        is_oa=True,
+        raw={"arxiv_id": arxiv_id, "doi": doi},
+    )
 
-def search_arxiv(keywords: list[str], max_records=200):
+def _arxiv_clauses(filters: SearchFilters | None) -> list[str]:
+    """arXiv only knows submission dates; everything there is open access with an abstract."""
+    if filters is None or not (filters.from_date or filters.to_date):
+        return []
+    start, end = filters.date_range(earliest="1991-01-01", latest="2999-12-31")
+    return [f"submittedDate:[{start.replace('-', '')}0000 TO {end.replace('-', '')}2359]"]
+
+def _total_results(root) -> int | None:
+    if root is None:
+        return None
+    try:
+        return int(root.findtext("opensearch:totalResults", namespaces=NS))
+    except (TypeError, ValueError):
+        return None
+
+def iter_arxiv(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+):
+    """Yield ``(rec_id, record)`` pairs page by page as arXiv returns them (resumable via ``state``).
+
+    With ``combine`` all keywords are sent as one query of ``ti:``/``abs:`` OR clauses.
+    A date range in ``filters`` restricts ``submittedDate``. After the first page,
+    which reports the number of results, the following pages are prefetched.
+    """
     base = "https://export.arxiv.org/api/query"
     per_page = 100
     pages = math.ceil(max_records / per_page)
-    results = {}
-    pbar = tqdm(total=pages * len(keywords), desc="arXiv search pages", unit="page")
-    for kw in keywords:
-        clauses = [f"ti:\"{kw}\"", f"abs:\"{kw}\""]
-        query = "(" + " OR ".join(clauses) + ")"
-        for i in range(pages):
-            start = i * per_page
-            size = min(per_page, max_records - start)
-            if size <= 0:
-                break
-            params = {
-                "search_query": query,
-                "start": start,
-                "max_results": size,
-                "sortBy": "submittedDate",
-                "sortOrder": "descending",
-            }
-            r = safe_get(f"{base}?{urlencode(params)}", stream=False)
-            if not r:
-                break
-            try:
-                root = ET.fromstring(r.text)
-            except Exception:
-                break
-            for entry in root.findall("atom:entry", namespaces=NS):
-                parsed = _parse_entry(entry)
-                if not parsed:
-                    continue
-                rec_id, rec = parsed
-                if rec_id in results:
-                    continue
-                results[rec_id] = rec
-            pbar.update(1)
-    pbar.close()
-    return results
+    seen = set()
+    groups = keyword_groups(keywords, combine)
+    pbar = tqdm(total=pages * len(groups), desc="arXiv search pages", unit="page", position=position)
+    try:
+        for kw, terms in groups:
+            clauses = [c for t in terms for c in (f"ti:\"{t}\"", f"abs:\"{t}\"")]
+            query = " AND ".join(["(" + " OR ".join(clauses) + ")"] + _arxiv_clauses(filters))
+            progress = search_progress(state, kw)
+            if progress["done"]:
+                continue
+            first_page = (progress["cursor"] or 0) // per_page
+            pbar.update(first_page)
+
+            def fetch(start, query=query):
+                params = {
+                    "search_query": query,
+                    "start": start,
+                    "max_results": min(per_page, max_records - start),
+                    "sortBy": "submittedDate",
+                    "sortOrder": "descending",
+                }
+                r = safe_get(f"{base}?{urlencode(params)}", stream=False)
+                if not r:
+                    return None
+                try:
+                    return ET.fromstring(r.text)
+                except Exception:
+                    return None
+
+            starts = range(first_page * per_page, pages * per_page, per_page)
+            first = fetch(starts[0]) if starts else None
+            total = _total_results(first)
+            later = [s for s in starts[1:] if total is None or s < total]
+            rest = prefetch_pages(fetch, later)
+            for start, root in chain([(starts[0], first)] if starts else [], rest):
+                if root is None:
+                    break
+                pbar.update(1)
+                entries = root.findall("atom:entry", namespaces=NS)
+                for entry in entries:
+                    parsed = _parse_entry(entry)
+                    if not parsed:
+                        continue
+                    rec_id, rec = parsed
+                    if rec_id in seen:
+                        continue
+                    seen.add(rec_id)
+                    yield rec_id, rec
+                progress["cursor"] = start + per_page
+                if not entries:
+                    progress["done"] = True
+                    break
+            rest.close()
+            if (progress["cursor"] or 0) >= max_records or (total is not None and progress["cursor"] >= total):
+                progress["done"] = True
+    finally:
+        pbar.close()
+
+def search_arxiv(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+):
+    return dict(iter_arxiv(keywords, max_records, position=position, state=state, combine=combine, filters=filters))
@@ -3,59 +3,189 @@ from tqdm import tqdm
 from urllib.parse import quote_plus
 
 import config
-from utils import safe_request_json, norm_doi
+import http_client
+from utils import safe_request_json, norm_doi, search_progress, json_loads
+from search.filters import SearchFilters
+from search.record import Record
 
-def search_crossref(keywords: list[str], max_records=200):
+# the only fields the parser below reads
+_SELECT = "DOI,title,abstract"
+
+def _jats_abstract_text(abstract: str) -> str:
+    return BeautifulSoup(abstract, "lxml").get_text(" ", strip=True)
+
+def _get_page(url: str, params: dict, refresh: bool) -> tuple[dict | None, bool]:
+    """One result page and whether Crossref refused the request (4xx: e.g. an expired cursor).
+
+    Network errors, 5xx responses, rate limits and open circuits return ``(None, False)``.
+    """
+    try:
+        r = http_client.get(url, params=params, cache=True, refresh=refresh)
+    except Exception as e:
+        print(e, flush=True)
+        return None, False
+    if r.status_code != 200:
+        print(f"Crossref returned HTTP {r.status_code}", flush=True)
+        return None, 400 <= r.status_code < 500 and r.status_code not in (408, 429)
+    try:
+        return json_loads(r.content), False
+    except ValueError:
+        return None, False
+
+def _crossref_filter(filters: SearchFilters | None) -> str | None:
+    """Crossref has no open-access filter; abstracts and publication dates are supported."""
+    if filters is None:
+        return None
+    parts = []
+    if filters.has_abstract:
+        parts.append("has-abstract:true")
+    if filters.from_date:
+        parts.append(f"from-pub-date:{filters.from_date}")
+    if filters.to_date:
+        parts.append(f"until-pub-date:{filters.to_date}")
+    return ",".join(parts) or None
+
+def year_counts_crossref(terms: list[str], filters: SearchFilters | None = None) -> dict[int, int]:
+    """Hits per publication year of a Crossref query (``published`` facet, no items)."""
+    params = {
+        "query": " ".join(terms),
+        "rows": 0,
+        "facet": "published:*",
+        "mailto": config.UNPAYWALL_EMAIL or "you@example.com",
+    }
+    api_filter = _crossref_filter(filters)
+    if api_filter:
+        params["filter"] = api_filter
+    data = safe_request_json("https://api.crossref.org/works", params=params) or {}
+    values = ((data.get("message") or {}).get("facets") or {}).get("published", {}).get("values") or {}
+    counts = {}
+    for year, n in values.items():
+        try:
+            counts[int(year)] = int(n)
+        except (TypeError, ValueError):
+            continue
+    return counts
+
+def abstracts_crossref(dois: list[str]) -> dict[str, str]:
+    """Abstracts of ``dois``, ``config.BULK_DOIS`` per request (``filter=doi:a,doi:b,...``).
+
+    Answered DOIs without an abstract map to ``""``; DOIs of failed requests are left out.
+    """
+    # the comma separates filters: such DOIs cannot be asked for (and count as answered)
+    found = {d: "" for d in dois if "," in d}
+    dois = [d for d in dois if "," not in d]
+    for i in range(0, len(dois), config.BULK_DOIS):
+        batch = dois[i : i + config.BULK_DOIS]
+        params = {
+            "filter": ",".join(f"doi:{d}" for d in batch),
+            "select": "DOI,abstract",
+            "rows": len(batch),
+            "mailto": config.UNPAYWALL_EMAIL or "you@example.com",
+        }
+        data = safe_request_json("https://api.crossref.org/works", params=params)
+        if not data or not isinstance(data.get("message"), dict):
+            continue
+        found.update(dict.fromkeys(batch, ""))
+        for it in data["message"].get("items") or []:
+            doi = norm_doi(it.get("DOI"))
+            if doi and isinstance(it.get("abstract"), str):
+                abstract = _jats_abstract_text(it["abstract"])
+                if abstract:
+                    found[doi] = abstract
+    return found
+
+def iter_crossref(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    filters: SearchFilters | None = None,
+):
+    """Yield ``(doi, record)`` pairs page by page as Crossref returns them (resumable via ``state``)."""
     base = "https://api.crossref.org/works"
     rows = 100
-    results = {}
+    seen = set()
     download_key = config.ELSEVIER_DOWNLOAD_API_KEY or config.ELSEVIER_SEARCH_API_KEY
-    pbar = tqdm(total=max_records * len(keywords), desc="Crossref search", unit="rec")
-    for kw in keywords:
-        cursor = "*"
-        collected = 0
-        while collected < max_records:
-            params = {"query": kw, "rows": rows, "cursor": cursor, "mailto": config.UNPAYWALL_EMAIL or "you@example.com"}
-            data = safe_request_json(base, params=params)
-            if not data:
-                break
-            items = data.get("message", {}).get("items", []) or []
-            for it in items:
-                doi = norm_doi(it.get("DOI"))
-                if not doi or doi in results:
+    pbar = tqdm(total=max_records * len(keywords), desc="Crossref search", unit="rec", position=position)
+    try:
+        for kw in keywords:
+            progress = search_progress(state, kw)
+            if progress["done"]:
+                continue
+            cursor = progress["cursor"] or "*"
+            collected = progress["collected"]
+            resumed = collected  # counted by an earlier run, not in ``seen``
+            refresh = False
+            while collected < max_records:
+                params = {"query": kw, "rows": rows, "cursor": cursor, "mailto": config.UNPAYWALL_EMAIL or "you@example.com"}
+                if not config.KEEP_RAW_RECORDS:
+                    params["select"] = _SELECT
+                api_filter = _crossref_filter(filters)
+                if api_filter:
+                    params["filter"] = api_filter
+                data, refused = _get_page(base, params, refresh)
+                if refused and cursor != "*" and not refresh:
+                    # cursors expire after 5 minutes on the server (a resumed or cached one may
+                    # be gone): page again from the start without the cache; records yielded
+                    # by this call are skipped via ``seen``, earlier runs' ones counted again
+                    cursor, refresh = "*", True
+                    collected -= resumed
+                    resumed = 0
                     continue
-                title = " ".join(it.get("title") or []) if it.get("title") else ""
-                abstr = ""
-                if "abstract" in it and isinstance(it["abstract"], str):
-                    abstr = BeautifulSoup(it["abstract"], "lxml").get_text(" ", strip=True)
-
-                pdf_url = None
-                xml_url = None
-                if download_key:
-                    doi_path = quote_plus(doi)
-                    pdf_url = (
-                        "https://api.elsevier.com/content/article/doi/"
-                        f"{doi_path}?httpAccept=application/pdf&apiKey={download_key}"
-                    )
-                    xml_url = (
-                        "https://api.elsevier.com/content/article/doi/"
-                        f"{doi_path}?httpAccept=application/xml&apiKey={download_key}"
-                    )
+                if not data:
+                    break
+                items = data.get("message", {}).get("items", []) or []
+                for it in items:
+                    doi = norm_doi(it.get("DOI"))
+                    if not doi or doi in seen:
+                        continue
+                    title = " ".join(it.get("title") or []) if it.get("title") else ""
+                    abstract_source = None
+                    if "abstract" in it and isinstance(it["abstract"], str):
+                        # JATS markup is parsed only when the abstract is read
+                        abstract_source = (_jats_abstract_text, it["abstract"])
 
-                results[doi] = {
-                    "source": "crossref",
-                    "title": title or "",
-                    "abstract": abstr or "",
-                    "pdf_url": pdf_url,
-                    "xml_url": xml_url,
-                    "raw": it
-                }
-                collected += 1
-                pbar.update(1)
-                if collected >= max_records:
+                    pdf_url = None
+                    xml_url = None
+                    if download_key:
+                        doi_path = quote_plus(doi)
+                        pdf_url = (
+                            "https://api.elsevier.com/content/article/doi/"
+                            f"{doi_path}?httpAccept=application/pdf&apiKey={download_key}"
+                        )
+                        xml_url = (
+                            "https://api.elsevier.com/content/article/doi/"
+                            f"{doi_path}?httpAccept=application/xml&apiKey={download_key}"
+                        )
+
+                    seen.add(doi)
+                    collected += 1
+                    pbar.update(1)
+                    yield doi, Record(
+                        source="crossref",
+                        title=title or "",
+                        pdf_url=pdf_url,
+                        xml_url=xml_url,
+                        raw=it,
+                        abstract_source=abstract_source,
+                    )
+                    if collected >= max_records:
+                        break
+                cursor = data.get("message", {}).get("next-cursor")
+                progress.update(cursor=cursor, collected=collected)
+                if not cursor or not items:
+                    progress["done"] = True
                     break
-            cursor = data.get("message", {}).get("next-cursor")
-            if not cursor:
-                break
-    pbar.close()
-    return results
+            if collected >= max_records:
+                progress["done"] = True
+    finally:
+        pbar.close()
+
+def search_crossref(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    filters: SearchFilters | None = None,
+):
+    return dict(iter_crossref(keywords, max_records, position=position, state=state, filters=filters))
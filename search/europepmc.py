@@ -1,57 +1,240 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import re
+import threading
+
 from tqdm import tqdm
-from utils import safe_request_json, norm_doi
+import config
+import http_client
+from utils import safe_request_json, norm_doi, search_progress, keyword_groups
+from search.filters import SearchFilters
+from search.record import Record
+
+FULLTEXT_XML_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/{pmcid}/fullTextXML"
+_FULLTEXT_XML_RE = re.compile(r"^https://www\.ebi\.ac\.uk/europepmc/webservices/rest/(PMC\d+)/fullTextXML$")
+
+_fulltext_lock = threading.Lock()
+_fulltext_pool: ThreadPoolExecutor | None = None
+_fulltext_pending: dict[str, Future] = {}  # prefetched full texts not yet taken
+
+def _europepmc_links(item: dict) -> tuple[str | None, str | None]:
+    """PDF/XML links from ``fullTextUrlList`` (core results) or the PMC id (both types)."""
+    pdf_url, xml_url = None, None
+    ft = item.get("fullTextUrlList", {}) or {}
+    urls = ft.get("fullTextUrl", []) or []
+    for u in urls:
+        doc_style = (u.get("documentStyle") or "").lower()
+        link = u.get("url")
+        if not link:
+            continue
+        if "pdf" in doc_style and not pdf_url:
+            pdf_url = link
+        if "xml" in doc_style and not xml_url:
+            xml_url = link
+    pmcid = item.get("pmcid")
+    if not pdf_url and pmcid and item.get("hasPDF") == "Y":
+        pdf_url = f"https://europepmc.org/articles/{pmcid}?pdf=render"
+    if not xml_url and pmcid and item.get("isOpenAccess") == "Y":
+        xml_url = FULLTEXT_XML_URL.format(pmcid=pmcid)
+    return pdf_url, xml_url
+
+def fulltext_pmcid(url: str | None) -> str | None:
+    """PMC id of a ``fullTextXML`` URL (``None`` for any other URL)."""
+    m = _FULLTEXT_XML_RE.match(url or "")
+    return m.group(1) if m else None
+
+def _get_fulltext_xml(pmcid: str) -> bytes | None:
+    try:
+        r = http_client.get(FULLTEXT_XML_URL.format(pmcid=pmcid), cache=True)
+        if r.status_code != 200:
+            r.close()
+            return None
+        return r.content or None
+    except Exception:
+        return None
+
+def prefetch_fulltext_xml(pmcid: str) -> bool:
+    """Start fetching the JATS full text of ``pmcid`` in the background.
+
+    The body is kept until ``fetch_fulltext_xml(pmcid)`` takes it. Nothing is started
+    while ``config.EUROPEPMC_FULLTEXT_PENDING`` fetches are untaken; returns whether
+    a fetch was started.
+    """
+    global _fulltext_pool
+    with _fulltext_lock:
+        if pmcid in _fulltext_pending or len(_fulltext_pending) >= config.EUROPEPMC_FULLTEXT_PENDING:
+            return False
+        if _fulltext_pool is None:
+            _fulltext_pool = ThreadPoolExecutor(
+                max_workers=config.EUROPEPMC_FULLTEXT_WORKERS, thread_name_prefix="europepmc-xml"
+            )
+        _fulltext_pending[pmcid] = _fulltext_pool.submit(_get_fulltext_xml, pmcid)
+        return True
+
+def fetch_fulltext_xml(pmcid: str) -> bytes | None:
+    """JATS full text of an open-access PMC article (``None`` when EuropePMC has none).
+
+    Responses are cached (``config.HTTP_CACHE_TTLS``); a fetch started by
+    ``prefetch_fulltext_xml`` is awaited and its body taken instead of repeating it.
+    """
+    with _fulltext_lock:
+        future = _fulltext_pending.pop(pmcid, None)
+    if future is not None:
+        return future.result()
+    return _get_fulltext_xml(pmcid)
+
+def _europepmc_clauses(filters: SearchFilters | None) -> list[str]:
+    if filters is None:
+        return []
+    clauses = []
+    if filters.open_access:
+        clauses.append("OPEN_ACCESS:y")
+    if filters.has_pdf:
+        clauses.append("HAS_PDF:y")
+    if filters.has_abstract:
+        clauses.append("HAS_ABSTRACT:y")
+    if filters.from_date or filters.to_date:
+        start, end = filters.date_range()
+        clauses.append(f"FIRST_PDATE:[{start} TO {end}]")
+    return clauses
 
-def search_europe_pmc(keywords: list[str], max_records=200):
+def _europepmc_query(terms: list[str], filters: SearchFilters | None) -> str:
+    clauses = [c for t in terms for c in (f'TITLE:"{t}"', f'ABSTRACT:"{t}"')]
+    return " AND ".join(["(" + " OR ".join(clauses) + ")"] + _europepmc_clauses(filters))
+
+def count_europe_pmc(terms: list[str], filters: SearchFilters | None = None) -> int | None:
+    """Number of hits of the OR query of ``terms`` (``None`` when the request fails)."""
+    params = {
+        "query": _europepmc_query(terms, filters),
+        "format": "json",
+        "resultType": "idlist",
+        "pageSize": "1",
+    }
+    data = safe_request_json("https://www.ebi.ac.uk/europepmc/webservices/rest/search", params=params)
+    if not data:
+        return None
+    try:
+        return int(data.get("hitCount"))
+    except (TypeError, ValueError):
+        return None
+
+def abstracts_europe_pmc(dois: list[str]) -> dict[str, str]:
+    """Abstracts of ``dois``, ``config.BULK_DOIS`` per ``DOI:`` OR query.
+
+    Answered DOIs without an abstract map to ``""``; DOIs of failed requests are left out.
+    """
+    found = {}
+    for i in range(0, len(dois), config.BULK_DOIS):
+        batch = dois[i : i + config.BULK_DOIS]
+        params = {
+            "query": " OR ".join(f'DOI:"{d}"' for d in batch),
+            "format": "json",
+            "resultType": "core",
+            "pageSize": "100",  # a DOI may match a preprint and the article
+        }
+        data = safe_request_json("https://www.ebi.ac.uk/europepmc/webservices/rest/search", params=params)
+        if not data or "resultList" not in data:
+            continue
+        found.update(dict.fromkeys(batch, ""))
+        for item in data["resultList"].get("result", []) or []:
+            doi = norm_doi(item.get("doi"))
+            if doi in found and item.get("abstractText") and not found[doi]:
+                found[doi] = item["abstractText"]
+    return found
+
+def iter_europe_pmc(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+    abstracts: bool = True,
+):
+    """Yield ``(doi, record)`` pairs page by page as EuropePMC returns them (resumable via ``state``).
+
+    With ``combine`` all keywords are sent as one boolean OR query. ``filters`` are
+    added as ``OPEN_ACCESS``/``HAS_PDF``/``HAS_ABSTRACT``/``FIRST_PDATE`` clauses.
+    Without ``abstracts`` the much smaller ``lite`` result type is requested; its
+    records carry no abstract and only links derived from the PMC id.
+    Open-access PMC articles get their JATS ``fullTextXML`` as ``xml_url``.
+    """
     base = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
     page_size = 100
-    results = {}
-    pbar = tqdm(total=max_records * len(keywords), desc="EuropePMC search", unit="rec")
-    for kw in keywords:
-        clauses = [f'TITLE:"{kw}"', f'ABSTRACT:"{kw}"']
-        query = "(" + " OR ".join(clauses) + ")"
-        cursor_mark = "*"
-        collected = 0
-        while collected < max_records:
-            params = {"query": query, "format": "json", "pageSize": str(page_size), "cursorMark": cursor_mark}
-            data = safe_request_json(base, params=params)
-            if not data:
-                break
-            hits = data.get("resultList", {}).get("result", []) or []
-            next_cursor = data.get("nextCursorMark")
-            if not hits:
-                break
-            for item in hits:
-                doi = norm_doi(item.get("doi"))
-                if not doi or doi in results:
-                    continue
-                title = item.get("title") or ""
-                abstr = item.get("abstractText") or ""
-                pdf_url, xml_url = None, None
-                ft = item.get("fullTextUrlList", {}) or {}
-                urls = ft.get("fullTextUrl", []) or []
-                for u in urls:
-                    doc_style = (u.get("documentStyle") or "").lower()
-                    link = u.get("url")
-                    if not link:
-                        continue
-                    if "pdf" in doc_style and not pdf_url:
-                        pdf_url = link
-                    if "xml" in doc_style and not xml_url:
-                        xml_url = link
-                results[doi] = {
-                    "source": "europepmc",
-                    "title": title,
-                    "abstract": abstr,
-                    "pdf_url": pdf_url,
-                    "xml_url": xml_url,
-                    "raw": item
+    seen = set()
+    groups = keyword_groups(keywords, combine)
+    pbar = tqdm(total=max_records * len(groups), desc="EuropePMC search", unit="rec", position=position)
+    try:
+        for kw, terms in groups:
+            query = _europepmc_query(terms, filters)
+            progress = search_progress(state, kw)
+            if progress["done"]:
+                continue
+            cursor_mark = progress["cursor"] or "*"
+            collected = progress["collected"]
+            while collected < max_records:
+                params = {
+                    "query": query,
+                    "format": "json",
+                    "resultType": "core" if abstracts or config.KEEP_RAW_RECORDS else "lite",
+                    "pageSize": str(page_size),
+                    "cursorMark": cursor_mark,
                 }
-                collected += 1
-                pbar.update(1)
-                if collected >= max_records:
+                data = safe_request_json(base, params=params)
+                if not data:
+                    break
+                hits = data.get("resultList", {}).get("result", []) or []
+                next_cursor = data.get("nextCursorMark")
+                if not hits:
+                    progress["done"] = True
                     break
-            if not next_cursor or next_cursor == cursor_mark:
-                break
-            cursor_mark = next_cursor
-    pbar.close()
-    return results
+                for item in hits:
+                    doi = norm_doi(item.get("doi"))
+                    if not doi or doi in seen:
+                        continue
+                    title = item.get("title") or ""
+                    abstr = (item.get("abstractText") or "") if params["resultType"] == "core" else None
+                    pdf_url, xml_url = _europepmc_links(item)
+                    seen.add(doi)
+                    collected += 1
+                    pbar.update(1)
+                    yield doi, Record(
+                        source="europepmc",
+                        title=title,
+                        abstract=abstr,
+                        pdf_url=pdf_url,
+                        xml_url=xml_url,
+                        is_oa=(item.get("isOpenAccess") == "Y") if item.get("isOpenAccess") else None,
+                        raw=item,
+                    )
+                    if collected >= max_records:
+                        break
+                if not next_cursor or next_cursor == cursor_mark:
+                    progress.update(collected=collected, done=True)
+                    break
+                cursor_mark = next_cursor
+                progress.update(cursor=cursor_mark, collected=collected)
+            if collected >= max_records:
+                progress["done"] = True
+    finally:
+        pbar.close()
+
+def search_europe_pmc(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+    abstracts: bool = True,
+):
+    return dict(
+        iter_europe_pmc(
+            keywords,
+            max_records,
+            position=position,
+            state=state,
+            combine=combine,
+            filters=filters,
+            abstracts=abstracts,
+        )
+    )
@@ -0,0 +1,65 @@
+"""Filters pushed down to the source APIs, so fewer pages cross the wire."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import calendar
+import re
+
+_DATE_RE = re.compile(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$")
+
+
+def _full_date(value: str | None, end: bool) -> str | None:
+    """Expand ``YYYY``/``YYYY-MM``/``YYYY-MM-DD`` to the first (or last) day it covers."""
+    if not value:
+        return None
+    m = _DATE_RE.match(value.strip())
+    if not m:
+        raise ValueError(f"invalid date {value!r}, expected YYYY, YYYY-MM or YYYY-MM-DD")
+    year, month, day = int(m.group(1)), m.group(2), m.group(3)
+    month = int(month) if month else (12 if end else 1)
+    if day:
+        day = int(day)
+    else:
+        day = calendar.monthrange(year, month)[1] if end else 1
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Restrictions every source applies natively where its API supports them.
+
+    A filter that an API cannot express is not applied to that source.
+    """
+
+    open_access: bool = False
+    has_abstract: bool = False
+    has_pdf: bool = False
+    from_date: str | None = None  # publication date, YYYY[-MM[-DD]]
+    to_date: str | None = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "from_date", _full_date(self.from_date, end=False))
+        object.__setattr__(self, "to_date", _full_date(self.to_date, end=True))
+
+    @property
+    def active(self) -> bool:
+        return any([self.open_access, self.has_abstract, self.has_pdf, self.from_date, self.to_date])
+
+    def date_range(self, earliest: str = "1000-01-01", latest: str = "9999-12-31") -> tuple[str, str]:
+        """Both ends of the date range, open ends replaced by ``earliest``/``latest``."""
+        return self.from_date or earliest, self.to_date or latest
+
+    def signature(self) -> str:
+        """Stable text form, stored with search cursors that are only valid for these filters."""
+        parts = [
+            name
+            for name, on in [
+                ("open_access", self.open_access),
+                ("has_abstract", self.has_abstract),
+                ("has_pdf", self.has_pdf),
+            ]
+            if on
+        ]
+        if self.from_date or self.to_date:
+            parts.append("{}..{}".format(self.from_date or "", self.to_date or ""))
+        return ",".join(parts)
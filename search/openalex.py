@@ -1,6 +1,12 @@
 from tqdm import tqdm
 from bs4 import BeautifulSoup
-from utils import safe_request_json, norm_doi
+import config
+from utils import safe_request_json, norm_doi, search_progress, keyword_groups
+from search.filters import SearchFilters
+from search.record import Record, pack_json, unpack_json
+
+# the only fields the parser below reads (OpenAlex ``select`` takes root-level fields)
+_SELECT = "id,doi,ids,title,abstract_inverted_index,primary_location,best_oa_location,open_access"
 
 def _restore_openalex_abstract(inv_idx: dict | None) -> str:
     if not inv_idx:
@@ -16,49 +22,150 @@ def _restore_openalex_abstract(inv_idx: dict | None) -> str:
     except Exception:
         return ""
 
-def search_openalex(keywords: list[str], max_records=200):
+def _restore_packed_abstract(data: bytes) -> str:
+    return _restore_openalex_abstract(unpack_json(data))
+
+def _openalex_filter(filters: SearchFilters | None) -> str | None:
+    if filters is None:
+        return None
+    parts = []
+    if filters.open_access:
+        parts.append("is_oa:true")
+    if filters.has_abstract:
+        parts.append("has_abstract:true")
+    if filters.from_date:
+        parts.append(f"from_publication_date:{filters.from_date}")
+    if filters.to_date:
+        parts.append(f"to_publication_date:{filters.to_date}")
+    return ",".join(parts) or None
+
+def year_counts_openalex(terms: list[str], filters: SearchFilters | None = None) -> dict[int, int]:
+    """Hits per publication year of the OR query of ``terms`` (one ``group_by`` request)."""
+    params = {"search": " OR ".join(f'"{t}"' for t in terms), "group_by": "publication_year"}
+    api_filter = _openalex_filter(filters)
+    if api_filter:
+        params["filter"] = api_filter
+    data = safe_request_json("https://api.openalex.org/works", params=params) or {}
+    counts = {}
+    for group in data.get("group_by") or []:
+        try:
+            counts[int(group.get("key"))] = int(group.get("count") or 0)
+        except (TypeError, ValueError):
+            continue
+    return counts
+
+def abstracts_openalex(dois: list[str]) -> dict[str, str]:
+    """Abstracts of up to ``config.BULK_DOIS`` DOIs per request (``filter=doi:a|b|...``).
+
+    Every DOI of an answered request is in the result (``""``: no abstract); DOIs
+    of failed requests are left out.
+    """
+    found = {}
+    for i in range(0, len(dois), config.BULK_DOIS):
+        batch = dois[i : i + config.BULK_DOIS]
+        params = {
+            "filter": "doi:" + "|".join(batch),
+            "select": "doi,abstract_inverted_index",
+            "per_page": len(batch),
+        }
+        data = safe_request_json("https://api.openalex.org/works", params=params)
+        if not data or "results" not in data:
+            continue
+        found.update(dict.fromkeys(batch, ""))
+        for item in data["results"] or []:
+            doi = norm_doi(item.get("doi"))
+            abstract = _restore_openalex_abstract(item.get("abstract_inverted_index"))
+            if doi and abstract:
+                found[doi] = abstract
+    return found
+
+def iter_openalex(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+):
+    """Yield ``(doi, record)`` pairs page by page as OpenAlex returns them.
+
+    ``state`` maps keywords to their pagination progress; it is updated after every
+    page and a later call with the same ``state`` resumes where this one stopped.
+    With ``combine`` all keywords are sent as one OR query (state key ``"a OR b"``).
+    ``filters`` become the ``filter`` parameter (OA, abstract, publication dates).
+    """
     base = "https://api.openalex.org/works"
-    results = {}
+    seen = set()
     per_page = 200
-    pbar = tqdm(total=max_records * len(keywords), desc="OpenAlex search", unit="rec")
-    for kw in keywords:
-        cursor = "*"
-        collected = 0
-        params = {"search": f'"{kw}"', "per_page": per_page, "cursor": cursor}
-        while collected < max_records:
-            params["cursor"] = cursor
-            data = safe_request_json(base, params=params)
-            if not data or "results" not in data:
-                break
-            for item in data["results"]:
-                doi = norm_doi(item.get("doi") or (item.get("ids") or {}).get("doi"))
-                if not doi or doi in results:
-                    continue
-                title = item.get("title") or ""
-                abstr = _restore_openalex_abstract(item.get("abstract_inverted_index"))
+    groups = keyword_groups(keywords, combine)
+    pbar = tqdm(total=max_records * len(groups), desc="OpenAlex search", unit="rec", position=position)
+    try:
+        for kw, terms in groups:
+            progress = search_progress(state, kw)
+            if progress["done"]:
+                continue
+            cursor = progress["cursor"] or "*"
+            collected = progress["collected"]
+            params = {"search": " OR ".join(f'"{t}"' for t in terms), "per_page": per_page, "cursor": cursor}
+            if not config.KEEP_RAW_RECORDS:
+                params["select"] = _SELECT
+            api_filter = _openalex_filter(filters)
+            if api_filter:
+                params["filter"] = api_filter
+            while collected < max_records:
+                params["cursor"] = cursor
+                data = safe_request_json(base, params=params)
+                if not data or "results" not in data:
+                    break
+                for item in data["results"]:
+                    doi = norm_doi(item.get("doi") or (item.get("ids") or {}).get("doi"))
+                    if not doi or doi in seen:
+                        continue
+                    title = item.get("title") or ""
+                    # rebuilt from the (large) inverted index only when it is read
+                    inv_idx = item.get("abstract_inverted_index")
+                    abstract_source = (_restore_packed_abstract, pack_json(inv_idx)) if inv_idx else None
 
-                pdf_url = None
-                xml_url = None
-                for key in ["primary_location", "best_oa_location"]:
-                    loc = item.get(key) or {}
-                    if isinstance(loc, dict):
-                        pdf_url = pdf_url or loc.get("pdf_url")
+                    pdf_url = None
+                    xml_url = None
+                    for key in ["primary_location", "best_oa_location"]:
+                        loc = item.get(key) or {}
+                        if isinstance(loc, dict):
+                            pdf_url = pdf_url or loc.get("pdf_url")
 
-                results[doi] = {
-                    "source": "openalex",
-                    "title": title,
-                    "abstract": abstr or "",
-                    "pdf_url": pdf_url,
-                    "xml_url": xml_url,
-                    "raw": item
-                }
-                collected += 1
-                pbar.update(1)
-                if collected >= max_records:
+                    seen.add(doi)
+                    collected += 1
+                    pbar.update(1)
+                    yield doi, Record(
+                        source="openalex",
+                        title=title,
+                        pdf_url=pdf_url,
+                        xml_url=xml_url,
+                        is_oa=(item.get("open_access") or {}).get("is_oa"),
+                        raw=item,
+                        abstract_source=abstract_source,
+                    )
+                    if collected >= max_records:
+                        break
+                meta = data.get("meta") or {}
+                cursor = meta.get("next_cursor")
+                progress.update(cursor=cursor, collected=collected)
+                if not cursor:
+                    progress["done"] = True
                     break
-            meta = data.get("meta") or {}
-            cursor = meta.get("next_cursor")
-            if not cursor:
-                break
-    pbar.close()
-    return results
+            if collected >= max_records:
+                progress["done"] = True
+    finally:
+        pbar.close()
+
+def search_openalex(
+    keywords: list[str],
+    max_records=200,
+    position: int | None = None,
+    state: dict | None = None,
+    combine: bool = False,
+    filters: SearchFilters | None = None,
+):
+    return dict(
+        iter_openalex(keywords, max_records, position=position, state=state, combine=combine, filters=filters)
+    )
@@ -0,0 +1,148 @@
+"""Compact search result shared by all sources."""
+from __future__ import annotations
+
+import base64
+import importlib
+import zlib
+
+import config
+from utils import json_dumps, json_loads
+
+_FIELDS = ("source", "title", "abstract", "pdf_url", "xml_url", "is_oa", "raw")
+
+
+class Record:
+    """One search result.
+
+    The abstract may be given as ``abstract_source=(func, data)`` and is then built
+    by ``func(data)`` on first access, so records whose abstract is never read (no
+    abstract filter) skip the work. ``abstract=None`` means the source was not asked
+    for it (``has_abstract`` is then ``None``). The API item is kept only with
+    ``config.KEEP_RAW_RECORDS``, as compressed JSON decoded by ``raw_item()``.
+    ``to_dict()`` keeps a lazy abstract lazy: its source is saved, not the text.
+    """
+
+    __slots__ = ("source", "title", "pdf_url", "xml_url", "is_oa", "raw", "_abstract", "_abstract_source")
+
+    def __init__(
+        self,
+        source: str,
+        title: str = "",
+        abstract: str | None = "",
+        pdf_url: str | None = None,
+        xml_url: str | None = None,
+        is_oa: bool | None = None,
+        raw=None,
+        abstract_source: tuple | None = None,
+    ):
+        self.source = source
+        self.title = title or ""
+        self.pdf_url = pdf_url
+        self.xml_url = xml_url
+        self.is_oa = is_oa
+        self.raw = pack_json(raw) if raw is not None and config.KEEP_RAW_RECORDS else None
+        if abstract_source and not abstract:
+            self._abstract, self._abstract_source = None, abstract_source
+        else:
+            self._abstract, self._abstract_source = abstract, None
+
+    @property
+    def abstract(self) -> str:
+        if self._abstract is None:
+            if self._abstract_source is None:
+                return ""
+            func, data = self._abstract_source
+            try:
+                self._abstract = func(data) or ""
+            except Exception:
+                self._abstract = ""
+            self._abstract_source = None
+        return self._abstract
+
+    @abstract.setter
+    def abstract(self, value: str) -> None:
+        self._abstract = value or ""
+        self._abstract_source = None
+
+    @property
+    def has_abstract(self) -> bool | None:
+        """Whether an abstract is available, without building a lazy one."""
+        if self._abstract is None:
+            return bool(self._abstract_source[1]) if self._abstract_source else None
+        return bool(self._abstract)
+
+    def raw_item(self):
+        """The API item this record was built from (``None`` unless raw records are kept)."""
+        return unpack_json(self.raw) if self.raw is not None else None
+
+    def get(self, key: str, default=None):
+        """Dict-style read access for callers written against the former dict records."""
+        value = self.raw_item() if key == "raw" else getattr(self, key, None)
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return self.get(key)
+
+    def to_dict(self) -> dict:
+        data = {
+            "source": self.source,
+            "title": self.title,
+            "abstract": self._abstract,
+            "pdf_url": self.pdf_url,
+            "xml_url": self.xml_url,
+            "is_oa": self.is_oa,
+        }
+        if self._abstract_source is not None:
+            data["abstract_source"] = _dump_source(self._abstract_source)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Record":
+        return cls(
+            source=data.get("source") or "",
+            title=data.get("title") or "",
+            abstract=data.get("abstract"),
+            abstract_source=_load_source(data.get("abstract_source")),
+            pdf_url=data.get("pdf_url"),
+            xml_url=data.get("xml_url"),
+            is_oa=data.get("is_oa"),
+        )
+
+    def __repr__(self) -> str:
+        return f"Record(source={self.source!r}, title={self.title[:60]!r}, pdf_url={self.pdf_url!r})"
+
+
+def _dump_source(source: tuple) -> dict:
+    """JSON form of an ``abstract_source``; its function must be a module-level one in ``search``."""
+    func, data = source
+    packed = isinstance(data, bytes)
+    return {
+        "func": f"{func.__module__}:{func.__qualname__}",
+        "data": base64.b64encode(data).decode("ascii") if packed else data,
+        "packed": packed,
+    }
+
+
+def _load_source(saved: dict | None) -> tuple | None:
+    if not saved:
+        return None
+    module, _, name = saved["func"].partition(":")
+    if not module.startswith("search."):
+        return None
+    try:
+        func = getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError):
+        return None
+    data = saved["data"]
+    return func, base64.b64decode(data) if saved.get("packed") else data
+
+
+def pack_json(item) -> bytes:
+    """Compressed compact JSON, for payloads kept with a record."""
+    return zlib.compress(json_dumps(item))
+
+
+def unpack_json(data: bytes):
+    return json_loads(zlib.decompress(data))
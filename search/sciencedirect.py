@@ -1,12 +1,12 @@
 # articles_parser /search/sciencedirect.py
+from itertools import chain
 from tqdm import tqdm
-import time
 from urllib.parse import quote_plus
 import config
-from utils import safe_request_json, norm_doi
-
-MAX_RETRIES = 5
-RETRY_BASE_DELAY = 5  # sec
+from utils import safe_request_json, norm_doi, search_progress
+from search.filters import SearchFilters
+from search.record import Record
+from search.shards import prefetch_pages
 
 def _is_open_access(entry: dict) -> bool:
     """
@@ -20,100 +20,130 @@ def _is_open_access(entry: dict) -> bool:
         return val.strip().lower() in {"true", "1", "yes"}
     return False
 
-def _safe_request_with_retry(url, params):
-    """Retry with exponential backoff when the API returns an error."""
-    delay = RETRY_BASE_DELAY
-    for attempt in range(MAX_RETRIES):
-        data = safe_request_json(url, params=params)  # safe_request_json returns None on any error
-        if data is None:
-            time.sleep(delay)
-        else:
-            return data
-        delay *= 2
-
-    return None
-
-def search_sciencedirect(keywords: list[str], max_records=200, progress_cb=None):
+def iter_sciencedirect(
+    keywords: list[str],
+    max_records=200,
+    progress_cb=None,
+    position: int | None = None,
+    state: dict | None = None,
+    filters: SearchFilters | None = None,
+):
     """
-    ScienceDirect Search API:
-      - Open Access filtering
+    ScienceDirect Search API, yielding ``(doi, record)`` pairs page by page:
+      - Open Access filtering (client-side: the search API has no such parameter)
       - PDF URL is built via Content API (OA articles)
+      - resumable through ``state`` (keyword -> offset of the next page)
+      - a date range in ``filters`` is sent as the ``date`` parameter (years)
+      - the next ``config.SEARCH_PAGE_PREFETCH`` pages are requested while one is parsed
     """
-    results = {}
     if not config.ELSEVIER_SEARCH_API_KEY:
-        return results
+        return
 
     base = "https://api.elsevier.com/content/search/sciencedirect"
     count = 25
+    seen = set()
     download_key = config.ELSEVIER_DOWNLOAD_API_KEY or config.ELSEVIER_SEARCH_API_KEY
-    pbar = tqdm(total=max_records * len(keywords), desc="ScienceDirect search", unit="rec")
-    for kw in keywords:
-        query = f'"{kw}"'
-        start = 0
-        collected = 0
-        while collected < max_records:
+    pbar = tqdm(total=max_records * len(keywords), desc="ScienceDirect search", unit="rec", position=position)
+    try:
+        for kw in keywords:
+            query = f'"{kw}"'
+            progress = search_progress(state, kw)
+            if progress["done"]:
+                continue
+            start = progress["cursor"] or 0
+            collected = progress["collected"]
             params = {
                 "query": query,
                 "count": count,
-                "start": start,
                 "apiKey": config.ELSEVIER_SEARCH_API_KEY,
                 'httpAccept': 'application/json',
             }
+            if filters is not None and (filters.from_date or filters.to_date):
+                start_date, end_date = filters.date_range(earliest="1823", latest="2999")
+                params["date"] = f"{start_date[:4]}-{end_date[:4]}"
+
+            def fetch(offset, params=params):
+                return safe_request_json(base, params={**params, "start": offset})
+
+            # the first page tells how many results there are; later pages are prefetched
+            first = fetch(start)
+            total = int((first or {}).get("search-results", {}).get("opensearch:totalResults") or 0)
+            rest = prefetch_pages(fetch, range(start + count, total, count))
+            for start, data in chain([(start, first)], rest):
+                if collected >= max_records or not data:
+                    break
 
-            data = _safe_request_with_retry(base, params=params)
-            if not data:
-                break
-
-            sr = data.get("search-results", {})
-            items = sr.get("entry") or []
-            if not items:
-                break
-
-            added_this_page = 0
-            for it in items:
-                if not _is_open_access(it):
-                    continue
-
-                doi = norm_doi(it.get("prism:doi"))
-                if not doi or doi in results:
-                    continue
-
-                title = it.get("dc:title") or ""
-                abstract = it.get("dc:description") or ""
+                sr = data.get("search-results", {})
+                items = sr.get("entry") or []
+                if not items:
+                    progress["done"] = True
+                    break
 
-                pdf_url = None
-                xml_url = None
-                if download_key:
-                    doi_path = quote_plus(doi)
-                    pdf_url = (
-                        "https://api.elsevier.com/content/article/doi/"
-                        f"{doi_path}?httpAccept=application/pdf&apiKey={download_key}"
-                    )
-                    xml_url = (
-                        "https://api.elsevier.com/content/article/doi/"
-                        f"{doi_path}?httpAccept=application/xml&apiKey={download_key}"
+                added_this_page = 0
+                for it in items:
+                    if not _is_open_access(it):
+                        continue
+
+                    doi = norm_doi(it.get("prism:doi"))
+                    if not doi or doi in seen:
+                        continue
+
+                    title = it.get("dc:title") or ""
+                    abstract = it.get("dc:description") or ""
+
+                    pdf_url = None
+                    xml_url = None
+                    if download_key:
+                        doi_path = quote_plus(doi)
+                        pdf_url = (
+                            "https://api.elsevier.com/content/article/doi/"
+                            f"{doi_path}?httpAccept=application/pdf&apiKey={download_key}"
+                        )
+                        xml_url = (
+                            "https://api.elsevier.com/content/article/doi/"
+                            f"{doi_path}?httpAccept=application/xml&apiKey={download_key}"
+                        )
+
+                    seen.add(doi)
+                    collected += 1
+                    added_this_page += 1
+                    pbar.update(1)
+                    if progress_cb:
+                        progress_cb(1)
+                    yield doi, Record(
+                        source="sciencedirect",
+                        title=title,
+                        abstract=abstract,
+                        pdf_url=pdf_url,
+                        xml_url=xml_url,
+                        is_oa=True,
+                        raw=it,
                     )
+                    if collected >= max_records:
+                        break
 
-                results[doi] = {
-                    "source": "sciencedirect",
-                    "title": title,
-                    "abstract": abstract,
-                    "pdf_url": pdf_url,
-                    "xml_url": xml_url,
-                    "raw": it,
-                }
-
-                collected += 1
-                added_this_page += 1
-                pbar.update(1)
-                if progress_cb:
-                    progress_cb(1)
-                if collected >= max_records:
+                progress.update(cursor=start + count, collected=collected)
+                if added_this_page == 0 or len(items) < count:
+                    progress["done"] = True
                     break
-
-            if added_this_page == 0 or len(items) < count:
-                break
-
-            start += count
-    pbar.close()
-    return results
+            else:
+                progress["done"] = bool(first)
+            rest.close()
+            if collected >= max_records:
+                progress["done"] = True
+    finally:
+        pbar.close()
+
+def search_sciencedirect(
+    keywords: list[str],
+    max_records=200,
+    progress_cb=None,
+    position: int | None = None,
+    state: dict | None = None,
+    filters: SearchFilters | None = None,
+):
+    return dict(
+        iter_sciencedirect(
+            keywords, max_records, progress_cb=progress_cb, position=position, state=state, filters=filters
+        )
+    )
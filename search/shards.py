@@ -0,0 +1,198 @@
+"""Parallel harvesting: date-range shards for cursor-paged APIs, page prefetch for offset-paged ones."""
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import date
+from typing import Callable, Iterable
+import queue
+import threading
+
+import config
+from search.filters import SearchFilters
+
+_SHARD_DONE = object()
+_NO_OFFSET = object()
+EARLIEST_YEAR = 1800
+
+
+def plan_year_shards(counts: dict[int, int], target: int) -> list[tuple[int | None, int | None]]:
+    """Group consecutive years into shards of about ``target`` hits (a single year may exceed it).
+
+    The first shard is open towards the past and the last one towards the future, so
+    records dated outside the counted years are still covered.
+    """
+    years = sorted(y for y, n in counts.items() if n > 0)
+    if not years:
+        return [(None, None)]
+    shards: list[tuple[int | None, int | None]] = []
+    first, total = None, 0
+    for year in years:
+        n = counts[year]
+        if total and total + n > target:
+            shards.append((first, year - 1))
+            first, total = year, 0
+        total += n
+    shards.append((first, None))
+    return shards
+
+
+def bisect_year_shards(
+    count: Callable[[int, int], int | None],
+    first: int,
+    last: int,
+    target: int,
+) -> list[tuple[int | None, int | None]]:
+    """Split ``first..last`` in halves until ``count(first, last)`` is at most ``target``.
+
+    For APIs that only report a hit count per query; open ends as in ``plan_year_shards``.
+    """
+    ranges: list[tuple[int, int]] = []
+    stack = [(first, last)]
+    while stack:
+        lo, hi = stack.pop()
+        n = count(lo, hi)
+        if n == 0:
+            continue
+        if n is None or n <= target or lo == hi:
+            ranges.append((lo, hi))
+            continue
+        mid = (lo + hi) // 2
+        stack.extend([(mid + 1, hi), (lo, mid)])
+    if not ranges:
+        return [(None, None)]
+    ranges.sort()
+    # close the gaps left by empty ranges and open both ends
+    shards: list[tuple[int | None, int | None]] = []
+    for i, (lo, _) in enumerate(ranges):
+        hi = ranges[i + 1][0] - 1 if i + 1 < len(ranges) else None
+        shards.append((lo if i else None, hi))
+    return shards
+
+
+def year_bounds(filters: SearchFilters | None) -> tuple[int, int]:
+    """Years to plan shards over: the filter's date range or everything up to next year."""
+    first = int(filters.from_date[:4]) if filters and filters.from_date else EARLIEST_YEAR
+    last = int(filters.to_date[:4]) if filters and filters.to_date else date.today().year + 1
+    return first, last
+
+
+def shard_filters(base: SearchFilters | None, first: int | None, last: int | None) -> SearchFilters:
+    """``base`` narrowed to the years ``first..last`` (``None`` keeps that end of ``base``)."""
+    base = base or SearchFilters()
+    from_date, to_date = base.from_date, base.to_date
+    if first is not None:
+        from_date = max(from_date or "", f"{first:04d}-01-01")
+    if last is not None:
+        to_date = min(to_date or "9999-12-31", f"{last:04d}-12-31")
+    return replace(base, from_date=from_date, to_date=to_date)
+
+
+def shard_label(shard: tuple[int | None, int | None]) -> str:
+    first, last = shard
+    return f"{'' if first is None else first}..{'' if last is None else last}"
+
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_sharded(
+    search_func,
+    terms: list[str],
+    shards: list[tuple[int | None, int | None]],
+    max_records: int,
+    progress_for: Callable[[tuple], dict],
+    workers: int | None = None,
+    **kwargs,
+):
+    """Page the shards of one query in parallel and yield deduplicated ``(rec_id, rec)`` pairs.
+
+    ``search_func`` is an ``iter_*`` function taking ``state`` and ``filters``;
+    ``progress_for(shard)`` returns the resumable progress of a shard. Shards page on a
+    copy of it, which is written back only once the caller took the records queued
+    before (a checkpoint never skips records still in the queue). At most
+    ``workers`` (default ``config.SHARD_WORKERS``) shards are paged at once, all
+    sharing the per-host rate limits. Stops after ``max_records`` records in total.
+    """
+    label = " OR ".join(terms)
+    base = kwargs.pop("filters", None)
+    out: queue.Queue = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    slots = threading.Semaphore(max(1, workers or config.SHARD_WORKERS))
+
+    def run(shard):
+        progress = dict(progress_for(shard))
+        try:
+            with slots:
+                if stop.is_set():
+                    return
+                state = {label: progress}
+                items = search_func(terms, max_records, state=state, filters=shard_filters(base, *shard), **kwargs)
+                # the progress reached when an item is queued, committed once it is taken
+                for item in items:
+                    if not _put(out, (shard, item, dict(progress)), stop):
+                        break
+        except Exception as e:
+            print(f"Shard {shard_label(shard)} of '{label}' failed: {e}", flush=True)
+        finally:
+            _put(out, (shard, _SHARD_DONE, dict(progress)), stop)
+
+    for shard in shards:
+        threading.Thread(target=run, args=(shard,), name=f"shard-{shard_label(shard)}", daemon=True).start()
+
+    remaining, yielded, seen = len(shards), 0, set()
+    try:
+        while remaining and yielded < max_records:
+            shard, item, progress = out.get()
+            if item is _SHARD_DONE:
+                progress_for(shard).update(progress)
+                remaining -= 1
+                continue
+            if item[0] not in seen:
+                seen.add(item[0])
+                yielded += 1
+                yield item
+            progress_for(shard).update(progress)
+    finally:
+        stop.set()
+
+
+def prefetch_pages(fetch: Callable[[int], object], offsets: Iterable[int], window: int | None = None):
+    """Yield ``(offset, fetch(offset))`` in order while the next pages are already requested.
+
+    Up to ``window`` (default ``config.SEARCH_PAGE_PREFETCH``) requests are in flight;
+    pages requested but not consumed when the caller stops are discarded.
+    """
+    window = config.SEARCH_PAGE_PREFETCH if window is None else window
+    if window <= 1:
+        for offset in offsets:
+            yield offset, fetch(offset)
+        return
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="prefetch")
+    pending: deque = deque()
+    it = iter(offsets)
+    try:
+        for _ in range(window):
+            offset = next(it, _NO_OFFSET)
+            if offset is _NO_OFFSET:
+                break
+            pending.append((offset, pool.submit(fetch, offset)))
+        while pending:
+            offset, future = pending.popleft()
+            result = future.result()
+            nxt = next(it, _NO_OFFSET)
+            if nxt is not _NO_OFFSET:
+                pending.append((nxt, pool.submit(fetch, nxt)))
+            yield offset, result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
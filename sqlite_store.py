@@ -0,0 +1,58 @@
+"""SQLite plumbing shared by the inventory and the on-disk caches."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+import os
+import sqlite3
+import threading
+
+EVICT_EVERY = 50  # puts between size checks of a capped cache
+
+
+class ThreadConnections:
+    """One connection per thread and process (sqlite handles must not cross a fork).
+
+    A thread's connection is reopened when the database path changes. ``setup`` runs
+    on every new connection (pragmas, schema).
+    """
+
+    def __init__(self, setup: Callable[[sqlite3.Connection], None], timeout: float = 30):
+        self.setup = setup
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, path: Path) -> sqlite3.Connection:
+        state = getattr(self._local, "state", None)
+        if state is not None and state[0] == os.getpid() and state[1] == path:
+            return state[2]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        self.setup(conn)
+        self._local.state = (os.getpid(), path, conn)
+        self._local.puts = 0
+        return conn
+
+    def count_put(self) -> bool:
+        """Count a write of this thread; true every ``EVICT_EVERY`` writes, when to check the size."""
+        self._local.puts = getattr(self._local, "puts", 0) + 1
+        return self._local.puts % EVICT_EVERY == 1
+
+
+def evict_lru(conn: sqlite3.Connection, table: str, limit: int) -> None:
+    """Drop least recently used rows of ``table`` until it is below 90% of ``limit`` bytes.
+
+    ``table`` has ``key``, ``size`` and ``used`` columns.
+    """
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= limit:
+        return
+    target = int(limit * 0.9)
+    doomed = []
+    for key, size in conn.execute(f"SELECT key, size FROM {table} ORDER BY used"):
+        if total <= target:
+            break
+        doomed.append((key,))
+        total -= size
+    conn.executemany(f"DELETE FROM {table} WHERE key = ?", doomed)
@@ -0,0 +1,193 @@
+"""Worker threads connected by bounded queues for the streaming pipeline."""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Callable, Iterable
+
+import config
+
+DONE = object()  # end-of-stream marker passed down the queues
+
+
+def make_queue(maxsize: int | None = None) -> queue.Queue:
+    """Bounded queue; a full queue blocks the upstream stage (backpressure)."""
+    return queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE if maxsize is None else maxsize)
+
+
+def iter_queue(inbox: queue.Queue):
+    """Yield items from ``inbox`` until the end-of-stream marker arrives."""
+    while True:
+        item = inbox.get()
+        if item is DONE:
+            return
+        yield item
+
+
+class _Workers:
+    def __init__(self, name: str, outbox: queue.Queue):
+        self.name = name
+        self.outbox = outbox
+        self.threads: list[threading.Thread] = []
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self.outbox.put(DONE)
+
+    def join(self) -> None:
+        for thread in self.threads:
+            thread.join()
+
+
+class Producer(_Workers):
+    """Drain several iterables concurrently into ``outbox``, one thread per iterable.
+
+    An exception in one iterable is reported and ends only that iterable.
+    """
+
+    def __init__(self, sources: dict[str, Iterable], outbox: queue.Queue, name: str = "search"):
+        super().__init__(name, outbox)
+        self.sources = sources
+
+    def start(self) -> "Producer":
+        if not self.sources:
+            self.outbox.put(DONE)
+            return self
+        with self._lock:
+            self._remaining = len(self.sources)
+        for source, iterable in self.sources.items():
+            thread = threading.Thread(
+                target=self._run, args=(source, iterable), name=f"{self.name}-{source}", daemon=True
+            )
+            self.threads.append(thread)
+            thread.start()
+        return self
+
+    def _run(self, source: str, iterable: Iterable) -> None:
+        try:
+            for item in iterable:
+                self.outbox.put(item)
+        except Exception as e:
+            print(f"Search in {source} failed: {e}", flush=True)
+        finally:
+            self._finish()
+
+
+class Stage(_Workers):
+    """Apply ``func`` to items of ``inbox`` in ``workers`` threads and pass results to ``outbox``.
+
+    ``func`` may return ``None`` to drop an item. Items whose processing raises are
+    reported and dropped. ``DONE`` is forwarded once every worker has stopped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        workers: int = 1,
+    ):
+        super().__init__(name, outbox)
+        self.func = func
+        self.inbox = inbox
+        self.workers = max(1, workers)
+
+    def start(self) -> "Stage":
+        with self._lock:
+            self._remaining = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is DONE:
+                    self.inbox.put(DONE)  # let sibling workers see it too
+                    break
+                try:
+                    result = self.func(item)
+                except Exception as e:
+                    print(f"{self.name} stage failed: {e}", flush=True)
+                    continue
+                if result is not None:
+                    self.outbox.put(result)
+        finally:
+            self._finish()
+
+
+class BatchStage(_Workers):
+    """Pass items of ``inbox`` to ``func`` in lists of up to ``size`` items.
+
+    A batch is also flushed ``wait`` seconds after its first item arrived, so a slow
+    upstream does not hold items back. ``func`` returns the items to pass on; when it
+    raises, the error is reported and the batch is passed on unchanged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[list], Iterable],
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        size: int,
+        wait: float,
+    ):
+        super().__init__(name, outbox)
+        self.func = func
+        self.inbox = inbox
+        self.size = max(1, size)
+        self.wait = wait
+
+    def start(self) -> "BatchStage":
+        with self._lock:
+            self._remaining = 1
+        thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return self
+
+    def _flush(self, batch: list) -> None:
+        try:
+            results = list(self.func(batch))
+        except Exception as e:
+            print(f"{self.name} stage failed: {e}", flush=True)
+            results = batch
+        for result in results:
+            if result is not None:
+                self.outbox.put(result)
+
+    def _run(self) -> None:
+        batch: list = []
+        deadline = 0.0
+        try:
+            while True:
+                try:
+                    timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                    item = self.inbox.get(timeout=timeout)
+                except queue.Empty:
+                    self._flush(batch)
+                    batch = []
+                    continue
+                if item is DONE:
+                    break
+                if not batch:
+                    deadline = time.monotonic() + self.wait
+                batch.append(item)
+                if len(batch) >= self.size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        finally:
+            self._finish()
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the modules are imported flat, as when running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path, monkeypatch):
+    """Keep the HTTP and extraction caches of a test out of the user's cache directory."""
+    monkeypatch.setattr(config, "CACHE_DIR", tmp_path / "cache")
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from search import crossref
+
+
+class _Response:
+    def __init__(self, status_code: int, data: dict | None = None):
+        self.status_code = status_code
+        self.content = json.dumps(data or {}).encode()
+
+
+def _page(first: int, count: int, next_cursor: str | None) -> _Response:
+    items = [{"DOI": f"10.1/c{i}", "title": [f"t{i}"]} for i in range(first, first + count)]
+    return _Response(200, {"message": {"items": items, "next-cursor": next_cursor}})
+
+
+@pytest.fixture
+def requests_sent(monkeypatch):
+    sent = []
+
+    def get(url, params=None, **kwargs):
+        sent.append(params["cursor"])
+        return responses[params["cursor"]]
+
+    responses = {}
+    monkeypatch.setattr(crossref.http_client, "get", get)
+    return sent, responses
+
+
+def test_expired_cursor_restarts_from_the_first_page(requests_sent):
+    sent, responses = requests_sent
+    responses.update({"old": _Response(400), "*": _page(0, 3, "c2"), "c2": _page(3, 3, None)})
+    state = {"k": {"cursor": "old", "collected": 3, "done": False}}
+    dois = [doi for doi, _ in crossref.iter_crossref(["k"], 5, state=state)]
+    assert sent == ["old", "*", "c2"]
+    # the earlier run's records come again (deduplicated downstream) and are not double counted
+    assert dois == [f"10.1/c{i}" for i in range(5)]
+    assert state["k"]["collected"] == 5 and state["k"]["done"]
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_failed_request_keeps_the_cursor(requests_sent, status):
+    sent, responses = requests_sent
+    responses.update({"old": _Response(status), "*": _page(0, 3, None)})
+    state = {"k": {"cursor": "old", "collected": 3, "done": False}}
+    assert list(crossref.iter_crossref(["k"], 5, state=state)) == []
+    assert sent == ["old"]
+    assert state["k"] == {"cursor": "old", "collected": 3, "done": False}
@@ -0,0 +1,43 @@
+import pytest
+
+from search import europepmc
+
+_HIT = {
+    "doi": "10.1/E1",
+    "title": "Radiolysis of water",
+    "pmcid": "PMC1",
+    "isOpenAccess": "Y",
+    "hasPDF": "Y",
+}
+
+
+@pytest.fixture
+def result_types(monkeypatch):
+    sent = []
+
+    def request(url, params=None, **kwargs):
+        sent.append(params["resultType"])
+        hit = dict(_HIT)
+        if params["resultType"] == "core":
+            hit["abstractText"] = "Yields of hydrogen."
+        return {"resultList": {"result": [hit]}, "nextCursorMark": params["cursorMark"]}
+
+    monkeypatch.setattr(europepmc, "safe_request_json", request)
+    return sent
+
+
+def test_lite_results_without_abstracts(result_types):
+    ((doi, rec),) = europepmc.iter_europe_pmc(["radiolysis"], 10, abstracts=False)
+    assert result_types == ["lite"]
+    assert doi == "10.1/e1"
+    assert rec.has_abstract is None  # not asked for, unlike an empty abstract
+    assert rec.to_dict()["abstract"] is None
+    assert rec.pdf_url == "https://europepmc.org/articles/PMC1?pdf=render"
+    assert rec.xml_url == europepmc.FULLTEXT_XML_URL.format(pmcid="PMC1")
+
+
+def test_core_results_with_abstracts(result_types):
+    ((_, rec),) = europepmc.iter_europe_pmc(["radiolysis"], 10)
+    assert result_types == ["core"]
+    assert rec.has_abstract is True
+    assert rec.abstract == "Yields of hydrogen."
@@ -0,0 +1,45 @@
+import os
+import signal
+
+import pytest
+
+import config
+import extract
+
+
+def _crash_once(marker: str) -> str:
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "text"
+
+
+def _crash(_: str) -> str:
+    os._exit(1)
+
+
+def _interrupted() -> str:
+    os.kill(os.getpid(), signal.SIGINT)
+    return "done"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(config, "EXTRACT_WORKERS", 1)
+    extract.start_pool()
+    yield
+    extract.shutdown_pool()
+
+
+def test_task_lost_with_a_worker_runs_again(pool, tmp_path):
+    marker = str(tmp_path / "crashed")
+    assert extract._result(extract._submit(_crash_once, marker), _crash_once, marker) == "text"
+
+
+def test_repeated_crash_is_no_empty_result(pool, tmp_path):
+    with pytest.raises(extract.ExtractionError):
+        extract._result(extract._submit(_crash, "x"), _crash, "x")
+
+
+def test_workers_ignore_ctrl_c(pool):
+    assert extract._result(extract._submit(_interrupted), _interrupted) == "done"
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import config
+import pipeline
+from checkpoint import Checkpoint
+from search.record import Record
+
+
+def _fake_search(calls):
+    def search(terms, max_records, position=None, state=None, **kwargs):
+        (progress,) = state.values()
+        calls.append((dict(progress), kwargs.get("filters")))
+        for i in range(3):
+            yield f"10.1/r{i}", Record("openalex", title=f"t{i}")
+        progress.update(cursor="next", collected=3, done=True)
+
+    return search
+
+
+def _run(tmp_path, monkeypatch, plan):
+    monkeypatch.setattr(config, "SHARD_TARGET", 10)
+    monkeypatch.setattr(pipeline, "_plan_shards", lambda source, terms, filters: plan)
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json")
+    calls = []
+    items = pipeline._iter_keywords(
+        _fake_search(calls), [("k", ["k"])], 100, 0, "openalex", checkpoint, threading.Event(), sharded=True
+    )
+    return [rec_id for _, rec_id, _ in items], calls, checkpoint.progress("openalex", "k")
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        [(2000, None)],  # fewer hits than SHARD_TARGET
+        [(None, None)],  # the count request failed
+    ],
+)
+def test_single_shard_pages_the_query_from_the_start(tmp_path, monkeypatch, plan):
+    rec_ids, calls, progress = _run(tmp_path, monkeypatch, plan)
+    assert rec_ids == ["10.1/r0", "10.1/r1", "10.1/r2"]
+    assert len(calls) == 1
+    assert calls[0][0]["cursor"] is None  # not the shard plan
+    assert progress == {"cursor": "next", "collected": 3, "done": True}
+
+
+def test_several_shards_keep_the_plan_as_cursor(tmp_path, monkeypatch):
+    rec_ids, calls, progress = _run(tmp_path, monkeypatch, [(None, 1999), (2000, None)])
+    assert sorted(rec_ids) == ["10.1/r0", "10.1/r1", "10.1/r2"]  # deduplicated across shards
+    assert len(calls) == 2
+    assert progress["cursor"] == [[None, 1999], [2000, None]]
+    assert progress["done"]
+
+
+def test_stale_single_shard_plan_is_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SHARD_TARGET", 10)
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json")
+    checkpoint.progress("openalex", "k").update(cursor=[[None, None]], collected=5)
+    calls = []
+    items = pipeline._iter_keywords(
+        _fake_search(calls), [("k", ["k"])], 100, 0, "openalex", checkpoint, threading.Event(), sharded=True
+    )
+    assert len(list(items)) == 3
+    assert calls[0][0]["cursor"] is None and calls[0][0]["collected"] == 0
+
+
+def test_shard_progress_waits_for_the_consumer():
+    from search.shards import iter_sharded
+
+    progress = {(None, None): {"cursor": None, "collected": 0, "done": False}}
+
+    def search(terms, max_records, state=None, filters=None):
+        (p,) = state.values()
+        for page in range(2):
+            for i in range(2):
+                yield f"10.1/p{page}-{i}", Record("openalex")
+            p.update(cursor=f"page{page + 1}", collected=2 * (page + 1))
+        p["done"] = True
+
+    items = iter_sharded(search, ["k"], [(None, None)], 100, progress.__getitem__)
+    first = next(items)
+    assert first[0] == "10.1/p0-0"
+    threading.Event().wait(0.2)  # the shard has queued everything by now
+    assert progress[(None, None)]["cursor"] is None
+    rest = list(items)
+    assert len(rest) == 3
+    assert progress[(None, None)] == {"cursor": "page2", "collected": 4, "done": True}
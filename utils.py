@@ -1,6 +1,16 @@
-import re, time, requests
+import json
+import re
 from pathlib import Path
 import config
+import http_client
+
+# optional faster JSON parser
+HAS_ORJSON = False
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    pass
 
 _SPECIAL_SPACES = dict.fromkeys([
     0x00A0,  # NO-BREAK SPACE
@@ -44,26 +54,49 @@ def doi_to_fname(doi: str) -> str:
                  .replace(':', '_')
                  .replace(' ', '_'))
 
-def safe_request_json(url, params=None, headers=None):
-    time.sleep(config.RATE_LIMIT_SLEEP)
+def search_progress(state: dict | None, kw: str) -> dict:
+    """Pagination progress of ``kw`` inside a resumable search ``state`` (fresh without state)."""
+    fresh = {"cursor": None, "collected": 0, "done": False}
+    if state is None:
+        return fresh
+    return state.setdefault(kw, fresh)
+
+def keyword_groups(keywords: list[str], combine: bool = False) -> list[tuple[str, list[str]]]:
+    """Queries to send as ``(label, keywords)``: one per keyword, or a single OR query."""
+    if combine and len(keywords) > 1:
+        return [(" OR ".join(keywords), list(keywords))]
+    return [(kw, [kw]) for kw in keywords]
+
+def json_loads(data: bytes | str):
+    """Decode JSON with orjson when it is installed."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj) -> bytes:
+    """Compact UTF-8 JSON, encoded with orjson when it is installed."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def safe_request_json(url, params=None, headers=None, refresh=False):
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=config.REQUESTS_TIMEOUT)
+        r = http_client.get(url, params=params, headers=headers, cache=True, refresh=refresh)
         r.raise_for_status()
-        return r.json()
+        return json_loads(r.content)
     except Exception as e:
         print(e, flush=True)
         return None
 
 def safe_get(url, stream=False, headers=None, params=None):
-    time.sleep(config.RATE_LIMIT_SLEEP)
     try:
-        r = requests.get(
+        r = http_client.get(
             url,
-            timeout=config.REQUESTS_TIMEOUT,
             stream=stream,
             allow_redirects=True,
             headers=headers,
             params=params,
+            cache=not stream,
         )
         r.raise_for_status()
         return r